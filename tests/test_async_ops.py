@@ -0,0 +1,24 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from vital.security import async_ops
+
+
+def test_batch_fails_when_executor_is_shut_down():
+    executor = ThreadPoolExecutor(1)
+    executor.shutdown()
+    previous = async_ops.set_executor(executor)
+
+    async def encrypt_many(n):
+        calls = [async_ops.aes_encrypt(b'x' * 2000, b'k' * 32)
+                 for _ in range(n)]
+        return await asyncio.wait_for(
+            asyncio.gather(*calls, return_exceptions=True), 5)
+
+    try:
+        for n in (1, async_ops.MAX_BATCH + 6):
+            results = asyncio.run(encrypt_many(n))
+            assert len(results) == n
+            assert all(isinstance(r, RuntimeError) for r in results)
+    finally:
+        async_ops.set_executor(previous)
@@ -0,0 +1,103 @@
+import io
+import os
+import random
+
+import pytest
+
+from vital.security.container import (
+    ctr_encrypt, ctr_decrypt, ctr_encrypt_stream, ctr_encrypt_parallel,
+    ctr_decrypt_parallel, CTRReader, HEADER_SIZE, TAG_SIZE)
+
+
+SECRET = 'alBVlwe'
+CHUNK = 1024
+SIZES = (0, 1, 15, 16, CHUNK - 1, CHUNK, CHUNK + 1, 3 * CHUNK,
+         3 * CHUNK + 100)
+
+
+def _containers(data):
+    stream = io.BytesIO()
+    assert ctr_encrypt_stream(
+        io.BytesIO(data), stream, SECRET, chunk_size=CHUNK) == len(data)
+    return {
+        'ctr_encrypt': ctr_encrypt(data, SECRET, chunk_size=CHUNK),
+        'ctr_encrypt_stream': stream.getvalue(),
+        'ctr_encrypt_parallel': ctr_encrypt_parallel(
+            data, SECRET, chunk_size=CHUNK, workers=4)}
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_round_trip(size):
+    data = os.urandom(size)
+    for name, container in _containers(data).items():
+        chunks = max(1, -(-size // CHUNK))
+        assert len(container) == HEADER_SIZE + size + chunks * TAG_SIZE, \
+            name
+        assert ctr_decrypt(container, SECRET) == data, name
+        assert ctr_decrypt_parallel(container, SECRET, workers=4) == data, \
+            name
+
+
+def test_containers_differ():
+    data = os.urandom(100)
+    assert ctr_encrypt(data, SECRET) != ctr_encrypt(data, SECRET)
+
+
+def test_read_range():
+    rand = random.Random(1234)
+    data = os.urandom(5 * CHUNK + 37)
+    for container in _containers(data).values():
+        reader = CTRReader(io.BytesIO(container), SECRET)
+        assert len(reader) == len(data)
+        for _ in range(200):
+            start = rand.randrange(-10, len(data) + 10)
+            end = rand.randrange(start, len(data) + 20)
+            assert reader.read_range(start, end) == \
+                data[max(0, start):end], (start, end)
+
+
+def _rejected(container):
+    with pytest.raises(ValueError):
+        ctr_decrypt(container, SECRET)
+    with pytest.raises(ValueError):
+        ctr_decrypt_parallel(container, SECRET)
+
+
+def test_wrong_secret():
+    container = ctr_encrypt(b'data', SECRET)
+    with pytest.raises(ValueError):
+        ctr_decrypt(container, 'other')
+
+
+def test_tampered_header():
+    container = ctr_encrypt(os.urandom(100), SECRET, chunk_size=CHUNK)
+    for i in range(HEADER_SIZE):
+        tampered = bytearray(container)
+        tampered[i] ^= 1
+        _rejected(bytes(tampered))
+
+
+def test_tampered_chunks():
+    container = ctr_encrypt(os.urandom(3 * CHUNK), SECRET, chunk_size=CHUNK)
+    for i in (HEADER_SIZE, HEADER_SIZE + CHUNK - 1, HEADER_SIZE + CHUNK,
+              len(container) - 1):
+        tampered = bytearray(container)
+        tampered[i] ^= 1
+        _rejected(bytes(tampered))
+
+
+def test_reordered_chunks():
+    container = ctr_encrypt(os.urandom(3 * CHUNK), SECRET, chunk_size=CHUNK)
+    header = container[:HEADER_SIZE]
+    size = CHUNK + TAG_SIZE
+    chunks = [container[HEADER_SIZE + i * size:HEADER_SIZE + (i + 1) * size]
+              for i in range(3)]
+    _rejected(header + chunks[1] + chunks[0] + chunks[2])
+    _rejected(header + chunks[0] + chunks[2] + chunks[1])
+
+
+def test_truncated():
+    container = ctr_encrypt(os.urandom(3 * CHUNK), SECRET, chunk_size=CHUNK)
+    for end in (0, HEADER_SIZE - 1, HEADER_SIZE, HEADER_SIZE + CHUNK,
+                HEADER_SIZE + CHUNK + TAG_SIZE, len(container) - 1):
+        _rejected(container[:end])
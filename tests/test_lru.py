@@ -0,0 +1,71 @@
+import datetime
+import threading
+from collections import OrderedDict
+
+from vital.cache import local_lru, local_expiring_lru
+from vital.cache.decorators import expiring
+
+
+class Cached(object):
+
+    def __init__(self, cache_size):
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._cache_ttl = 600
+
+    @local_lru
+    def double(self, arg):
+        return arg * 2
+
+    @local_expiring_lru
+    def triple(self, arg):
+        return arg * 3
+
+
+def _hammer(func, cached, threads=8, keys=range(300), rounds=20):
+    errors = []
+    start = threading.Barrier(threads)
+
+    def run(offset):
+        start.wait()
+        try:
+            for _ in range(rounds):
+                for key in keys:
+                    key = (key + offset) % len(keys)
+                    assert func(cached, key) == func.__wrapped__(cached, key)
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=run, args=(i * 37,))
+               for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+    assert errors == []
+    assert len(cached._cache) <= cached._cache_size
+
+
+def test_local_lru_threads():
+    cached = Cached(cache_size=100)
+    _hammer(Cached.double, cached)
+
+
+def test_local_expiring_lru_threads():
+    cached = Cached(cache_size=100)
+    _hammer(Cached.triple, cached)
+
+
+def test_local_lru_hot_keys_stay_cached():
+    cached = Cached(cache_size=100)
+    _hammer(Cached.double, cached, keys=range(50))
+    assert len(cached._cache) == 50
+
+
+def test_expiring_aware_datetime():
+    now = datetime.datetime.utcnow()
+    tz = datetime.timezone(datetime.timedelta(hours=-5))
+    aware = datetime.datetime.now(tz) + datetime.timedelta(seconds=60)
+    expires = expiring(1, expires=aware).expires_at(now)
+    assert expires.tzinfo is None
+    assert 59 <= (expires - now).total_seconds() <= 61
@@ -0,0 +1,24 @@
+from vital.cache import replay_memoize
+
+
+def test_evicted_live_sources_are_closed():
+    closed = []
+
+    @replay_memoize(maxlen=100, maxsize=2)
+    def numbers(n):
+        try:
+            for i in range(n):
+                yield i
+        finally:
+            closed.append(n)
+
+    first = numbers(10)
+    assert next(first) == 0
+    list(numbers(20))
+    assert closed == [20]
+    #: Evicts the partially consumed numbers(10) and closes its source
+    list(numbers(30))
+    assert len(numbers.cache) == 2
+    assert closed == [20, 10, 30]
+    #: The interrupted consumer continues from a fresh copy
+    assert list(first) == list(range(1, 10))
@@ -0,0 +1,104 @@
+import time
+import threading
+
+from vital.security.sessions import SessionStore
+
+
+class SlowBackend(object):
+    """ In-memory backend whose reads and writes block on events """
+
+    def __init__(self):
+        self.data = {}
+        self.loading = threading.Event()
+        self.release_load = threading.Event()
+        self.release_load.set()
+        self.release_write = threading.Event()
+        self.release_write.set()
+
+    def load(self, key):
+        value = self.data.get(key)
+        self.loading.set()
+        self.release_load.wait(5)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def write_many(self, items):
+        self.release_write.wait(5)
+        self.data.update(items)
+
+    def delete_many(self, keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def close(self):
+        pass
+
+
+def _saved_session(store):
+    session = store.new()
+    session['user_id'] = 1234
+    cookie = store.save(session)
+    store.flush()
+    store.store.data.clear()
+    return session, cookie
+
+
+def test_delete_during_load():
+    backend = SlowBackend()
+    store = SessionStore('secret', backend=backend, interval=60)
+    session, cookie = _saved_session(store)
+    backend.release_load.clear()
+    loaded = []
+    reader = threading.Thread(target=lambda: loaded.append(store.load(cookie)))
+    reader.start()
+    assert backend.loading.wait(5)
+    store.delete(session)
+    store.flush()
+    backend.release_load.set()
+    reader.join(5)
+    assert loaded == [None]
+    assert session.sid not in store.store.data
+    assert store.load(cookie) is None
+    store.close()
+
+
+def test_read_during_flush_after_eviction():
+    backend = SlowBackend()
+    store = SessionStore('secret', backend=backend, interval=60,
+                         cache_size=1)
+    session, cookie = _saved_session(store)
+    session = store.load(cookie)
+    session['user_id'] = 5678
+    store.save(session)
+    #: Evicts the session from memory while its write is pending
+    store.save(store.new())
+    backend.release_write.clear()
+    flusher = threading.Thread(target=store.flush)
+    flusher.start()
+    try:
+        assert store.load(cookie)['user_id'] == 5678
+    finally:
+        backend.release_write.set()
+        flusher.join(5)
+    assert store.load(cookie)['user_id'] == 5678
+    store.close()
+
+
+def test_flush_purges_expired_sessions(tmp_path):
+    store = SessionStore('secret', str(tmp_path / 'sessions.db'), ttl=0.2,
+                         interval=60)
+    for _ in range(5):
+        session = store.new()
+        session['user_id'] = 1234
+        store.save(session)
+    store.flush()
+    fresh = store.new()
+    time.sleep(0.3)
+    store.save(fresh)
+    store.flush()
+    backend = store.store.backend
+    rows = backend._conn.execute(
+        'SELECT key FROM vital_sessions').fetchall()
+    assert rows == [(fresh.sid,)]
+    store.close()
@@ -0,0 +1,18 @@
+import hmac
+from hashlib import sha256
+
+from vital.security import hmac_stream, sign_stream, verify_stream
+
+
+def test_mmap_threshold_zero(tmp_path):
+    for data in (b'', b'abc', b'x' * 100000):
+        path = tmp_path / 'data'
+        path.write_bytes(data)
+        with open(str(path), 'rb') as f:
+            signature = sign_stream(f, 'secret', mmap_threshold=0)
+        with open(str(path), 'rb') as f:
+            assert verify_stream(f, signature, 'secret', mmap_threshold=0)
+        with open(str(path), 'rb') as f:
+            f.read()
+            assert hmac_stream(f, 'secret', mmap_threshold=0).digest() == \
+                hmac.new(b'secret', b'', sha256).digest()
@@ -0,0 +1,27 @@
+import os
+import time
+
+from vital.security.tokens import TokenStore
+
+
+def test_changes_are_saved_behind(tmp_path):
+    path = str(tmp_path / 'tokens.pickle')
+    with TokenStore('secret', path, autosave=60) as store:
+        tokens = [store.issue({'n': i}) for i in range(1000)]
+        store.revoke(tokens[0])
+        #: Nothing is written until the interval passes or the store closes
+        assert not os.path.exists(path)
+    store = TokenStore('secret', path, autosave=None)
+    assert len(store) == 999
+    assert store.verify(tokens[0]) is None
+    assert store.verify(tokens[1]) == {'n': 1}
+    store.close()
+
+
+def test_autosave_interval(tmp_path):
+    path = str(tmp_path / 'tokens.pickle')
+    store = TokenStore('secret', path, autosave=0.05)
+    token = store.issue()
+    time.sleep(0.5)
+    assert TokenStore('secret', path, autosave=None).verify(token) is True
+    store.close()
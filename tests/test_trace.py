@@ -0,0 +1,25 @@
+from vital.cache import DictProperty
+from vital.cache.trace import TraceRecorder, read_trace
+
+
+def test_dict_property_traces_each_instance(tmp_path):
+    path = str(tmp_path / 'trace')
+    tracer = TraceRecorder(path)
+
+    class A(object):
+
+        def __init__(self):
+            self._cache = {}
+
+        @DictProperty('_cache', tracer=tracer)
+        def v(self):
+            return 1
+
+    instances = [A() for _ in range(3)]
+    for a in instances:
+        assert a.v == 1
+        assert a.v == 1
+    tracer.close()
+    records = list(read_trace(path))
+    assert [hit for _, _, hit, _ in records] == [False, True] * 3
+    assert len({key for _, key, _, _ in records}) == 3
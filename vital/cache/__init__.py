@@ -10,17 +10,37 @@ import sys
 from threading import local
 
 from vital.cache.decorators import *
+from vital.cache.write_behind import *
+from vital.cache.prefork import *
 
 _all = [
   'local_lru',
   'typed_lru',
   'local_expiring_lru',
+  'expiring',
   'cached_property',
   'DictProperty',
   'memoize',
   'pickle_memoize',
+  'hash_memoize',
+  'zlib_memoize',
+  'replay_memoize',
+  'gdsf_cache',
+  'file_memoize',
+  'Compressor',
+  'zlib_compressor',
+  'TraceRecorder',
+  'CacheHooks',
+  'WriteBehindStore',
+  'SqliteBackend',
+  'FileBackend',
+  'prefork_warmup',
+  'compact_cache',
+  'FrozenCache',
+  'shared_memory',
+  'shared_memory_report',
   'sweet_pickle',
-  'high_pickle'
+  'high_pickle',
   'local_property'
 ]
 
@@ -28,7 +48,7 @@ from vital.tools import systools
 
 if systools.compat('3.4'):
     from vital.cache.async_decorators import async_lru
-    _all.append(async_lru)
+    _all.append('async_lru')
 
 
 __all__ = _all
@@ -10,13 +10,23 @@ try:
     import asyncio
 except ImportError:
     pass
+import os
+import sys
+import mmap
 import time
+import heapq
+import threading
 import collections
+import collections.abc
 import datetime
+import zlib
 import pickle
+import hashlib
 
 from functools import wraps, partial, update_wrapper
 
+from vital.cache.trace import TraceRecorder
+
 try:
     from functools import lru_cache
 except ImportError:
@@ -27,33 +37,231 @@ __all__ = (
   'local_lru',
   'typed_lru',
   'local_expiring_lru',
+  'expiring',
   'cached_property',
   'DictProperty',
   'memoize',
   'pickle_memoize',
+  'hash_memoize',
+  'zlib_memoize',
+  'replay_memoize',
+  'gdsf_cache',
+  'file_memoize',
+  'Compressor',
+  'zlib_compressor',
+  'TraceRecorder',
+  'CacheHooks',
   'sweet_pickle',
   'high_pickle'
 )
 
 
+#
+#  ``Value compression``
+#
+class _Compressed(object):
+    """ A compressed cache value """
+    __slots__ = ('data', 'text')
+
+    def __init__(self, data, text):
+        self.data, self.text = data, text
+
+
+class Compressor(object):
+    """ Transparently zlib compresses large #str and #bytes cache values on
+        insert and decompresses them on hit. Values below @threshold, values
+        of other types and values which do not shrink are stored as is.
+        ..
+            from vital.cache import Compressor, memoize
+
+            compressor = Compressor(threshold=2048)
+
+            @partial(memoize, compressor=compressor)
+            def render(template):
+                pass
+
+            compressor.stats()
+            # -> {'compressed': 12, 'raw_bytes': 245760, 'stored_bytes': 38912,
+            #     'saved_bytes': 206848, 'compress_time': 0.0031,
+            #     'decompressed': 340, 'decompress_time': 0.0094}
+        ..
+    """
+
+    def __init__(self, threshold=1024, level=6):
+        """ @threshold: #int minimum size in bytes of values to compress
+            @level: #int zlib compression level, 1-9
+        """
+        self.threshold = threshold
+        self.level = level
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """ Resets the statistics """
+        self.compressed = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.compress_time = 0.0
+        self.decompressed = 0
+        self.decompress_time = 0.0
+
+    def compress(self, value):
+        """ -> @value compressed if it is a large #str or #bytes, otherwise
+                @value
+        """
+        text = isinstance(value, str)
+        if not text and not isinstance(value, bytes):
+            return value
+        if len(value) < self.threshold:
+            return value
+        start = time.perf_counter()
+        raw = value.encode('utf-8') if text else value
+        data = zlib.compress(raw, self.level)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.compress_time += elapsed
+            if len(data) >= len(raw):
+                return value
+            self.compressed += 1
+            self.raw_bytes += len(raw)
+            self.stored_bytes += len(data)
+        return _Compressed(data, text)
+
+    def decompress(self, value):
+        """ -> the original value of @value if it was compressed by
+                :meth:compress, otherwise @value
+        """
+        if value.__class__ is not _Compressed:
+            return value
+        start = time.perf_counter()
+        r = zlib.decompress(value.data)
+        if value.text:
+            r = r.decode('utf-8')
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.decompress_time += elapsed
+            self.decompressed += 1
+        return r
+
+    @property
+    def saved_bytes(self):
+        return self.raw_bytes - self.stored_bytes
+
+    def stats(self):
+        """ -> #dict of compression statistics """
+        return {
+            'compressed': self.compressed,
+            'raw_bytes': self.raw_bytes,
+            'stored_bytes': self.stored_bytes,
+            'saved_bytes': self.saved_bytes,
+            'compress_time': self.compress_time,
+            'decompressed': self.decompressed,
+            'decompress_time': self.decompress_time
+        }
+
+
+zlib_compressor = Compressor()
+
+
+#
+#  ``Hooks``
+#
+class CacheHooks(object):
+    """ Receives update and eviction events from the cache engines. Pass an
+        instance as the @hooks of :class:memoize or :class:DictProperty, or
+        set it as |self._cache_hooks| for :func:local_lru and
+        :func:local_expiring_lru. Values are passed uncompressed.
+        ..
+            class Audit(CacheHooks):
+                def on_update(self, key, value):
+                    print('set', key)
+
+                def on_evict(self, key, value):
+                    print('evicted', key)
+        ..
+    """
+
+    def on_update(self, key, value):
+        """ Called after @value is stored in the cache under @key """
+
+    def on_evict(self, key, value):
+        """ Called after @key is evicted, expires or is deleted from the
+            cache
+        """
+
+
 #
 #  ``Python Caching Decorators``
 #
+#  The decorators don't rely on the GIL for correctness. Reads of plain dict
+#  caches are lock-free and inserts use the atomic :meth:dict.setdefault.
+#  OrderedDict LRUs are mutated under one of a fixed set of striped locks,
+#  chosen by the identity of the cache, so unrelated caches rarely contend.
+#  LRU hits never wait on that lock: the lookup itself is lock-free and the
+#  hit is only moved to the end if the lock is free. Under contention some
+#  recency updates are skipped, so eviction order is approximate, which
+#  keeps one hot cache from serializing every thread reading from it.
+#
+_locks = tuple(threading.Lock() for _ in range(64))
+_miss = object()
+
+
+def _lock_for(cache):
+    """ -> the striped :class:threading.Lock guarding @cache """
+    return _locks[(id(cache) >> 4) % 64]
+
+
+def _touch(cache, lock, key):
+    """ Moves @key to the end of the LRU @cache unless another thread holds
+        @lock, in which case the recency update is skipped
+    """
+    if lock.acquire(False):
+        try:
+            cache.move_to_end(key)
+        except KeyError:
+            #: Evicted since it was read
+            pass
+        finally:
+            lock.release()
+
+
 def local_lru(obj):
     """ Property that maps to a key in a local dict-like attribute.
         self._cache must be an OrderedDict
         self._cache_size must be defined as LRU size
+        self._cache_compressor is an optional :class:Compressor
+        self._cache_tracer is an optional :class:TraceRecorder
+        self._cache_hooks is an optional :class:CacheHooks
         ..
         class Foo(object):
 
             def __init__(self, cache_size=5000):
                 self._cache = OrderedDict()
                 self._cache_size = cache_size
+                self._cache_compressor = Compressor(threshold=4096)
 
             @local_lru
             def expensive_meth(self, arg):
                 pass
         ..
+
+        Hits don't wait on the lock guarding the cache, so threads sharing
+        one hot instance read from it concurrently, see the section comment
+        above. The throughput under threads can be compared with
+        ..
+            from concurrent.futures import ThreadPoolExecutor
+            from vital.debug import Compare
+
+            foo = Foo(cache_size=1000)
+            keys = list(range(2000)) * 50
+
+            def hammer(threads):
+                with ThreadPoolExecutor(threads) as pool:
+                    list(pool.map(foo.expensive_meth, keys))
+                assert len(foo._cache) <= foo._cache_size
+
+            Compare(lambda: hammer(1), lambda: hammer(8)).time(5)
+        ..
     """
     @wraps(obj)
     def memoizer(*args, **kwargs):
@@ -61,14 +269,40 @@ def local_lru(obj):
         lru_size = instance._cache_size
         if lru_size:
             cache = instance._cache
+            compressor = getattr(instance, '_cache_compressor', None)
+            tracer = getattr(instance, '_cache_tracer', None)
+            hooks = getattr(instance, '_cache_hooks', None)
             key = str((args, kwargs))
-            try:
-                r = cache.pop(key)
-                cache[key] = r
-            except KeyError:
-                if len(cache) >= lru_size:
-                    cache.popitem(last=False)
-                r = cache[key] = obj(*args, **kwargs)
+            lock = _lock_for(cache)
+            r = cache.get(key, _miss)
+            if r is _miss:
+                if tracer is None:
+                    r = obj(*args, **kwargs)
+                else:
+                    start = time.perf_counter()
+                    r = obj(*args, **kwargs)
+                    tracer.record(key, False, time.perf_counter() - start)
+                stored = r if compressor is None else compressor.compress(r)
+                evicted = updated = None
+                with lock:
+                    if key not in cache:
+                        if len(cache) >= lru_size:
+                            evicted = cache.popitem(last=False)
+                        cache[key] = stored
+                        updated = True
+                if hooks is not None:
+                    if evicted is not None:
+                        hooks.on_evict(
+                            evicted[0], evicted[1] if compressor is None else
+                            compressor.decompress(evicted[1]))
+                    if updated:
+                        hooks.on_update(key, r)
+                return r
+            _touch(cache, lock, key)
+            if tracer is not None:
+                tracer.record(key, True)
+            if compressor is not None:
+                r = compressor.decompress(r)
             return r
         return obj(*args, **kwargs)
     return memoizer
@@ -91,12 +325,12 @@ def typed_lru(maxsize, types=None):
             def some_expensive_func2():
                 pass
 
-            @typed_lru(300, collections.Hashable)
+            @typed_lru(300, collections.abc.Hashable)
             def some_expensive_func3():
                 pass
         ..
     """
-    types = types or collections.Hashable
+    types = types or collections.abc.Hashable
 
     def lru(obj):
         @lru_cache(maxsize)
@@ -124,11 +358,74 @@ def typed_lru(maxsize, types=None):
     return lru
 
 
+class expiring(object):
+    """ Wraps a value returned by a function cached with
+        :func:local_expiring_lru together with its own freshness lifetime,
+        which overrides |self._cache_ttl| for that entry.
+        ..
+        class Upstream(object):
+
+            @local_expiring_lru
+            def fetch(self, url):
+                response = http.get(url)
+                return expiring(response.body, ttl=response.max_age)
+
+            @local_expiring_lru
+            def token(self):
+                token = auth.issue()
+                return expiring(token.value, expires=token.expires_at)
+        ..
+    """
+    __slots__ = ('value', 'ttl', 'expires')
+
+    def __init__(self, value, ttl=None, expires=None):
+        """ @value: the value to cache and return
+            @ttl: #int, #float seconds or :class:datetime.timedelta the value
+                is fresh for. A TTL of |0| prevents the value from being
+                cached.
+            @expires: :class:datetime.datetime or #int, #float unix
+                timestamp the value expires at. Naive datetimes are taken
+                to be in UTC, aware ones are converted to UTC.
+        """
+        self.value = value
+        self.ttl = ttl
+        self.expires = expires
+
+    def expires_at(self, now, default_ttl=None):
+        """ -> UTC :class:datetime.datetime this value expires at, or |None|
+                if it should not be cached
+        """
+        expires = self.expires
+        if expires is not None:
+            if isinstance(expires, (int, float)):
+                expires = datetime.datetime.utcfromtimestamp(expires)
+            elif expires.tzinfo is not None:
+                #: Compared against the naive UTC :meth:utcnow
+                expires = expires.astimezone(
+                    datetime.timezone.utc).replace(tzinfo=None)
+            return expires
+        return _expires_at(
+            now, self.ttl if self.ttl is not None else default_ttl)
+
+
+def _expires_at(now, ttl):
+    if not ttl:
+        return None
+    if not isinstance(ttl, datetime.timedelta):
+        ttl = datetime.timedelta(seconds=ttl)
+    return now + ttl
+
+
 def local_expiring_lru(obj):
     """ Property that maps to a key in a local dict-like attribute.
         self._cache must be an OrderedDict
         self._cache_size must be defined as LRU size
         self._cache_ttl is the expiration time in seconds
+        self._cache_tracer is an optional :class:TraceRecorder
+        self._cache_hooks is an optional :class:CacheHooks
+
+        The cached method may return an :class:expiring value to give that
+        entry its own TTL or expiry time.
         ..
         class Foo(object):
 
@@ -140,35 +437,62 @@ def local_expiring_lru(obj):
             @local_expiring_lru
             def expensive_meth(self, arg):
                 pass
+
+            @local_expiring_lru
+            def short_lived_meth(self, arg):
+                return expiring(value, ttl=5)
         ..
     """
     @wraps(obj)
     def memoizer(*args, **kwargs):
         instance = args[0]
         lru_size = instance._cache_size
+        if not lru_size:
+            r = obj(*args, **kwargs)
+            return r.value if isinstance(r, expiring) else r
         cache_ttl = instance._cache_ttl
-        if lru_size and cache_ttl:
-            cache = instance._cache
-            kargs = list(args)
-            kargs[0] = id(instance)
-            key = str((kargs, kwargs))
-            try:
-                r = list(cache.pop(key))
-                if r[1] < datetime.datetime.utcnow():
-                    r[0] = None
-                else:
-                    cache[key] = r
-            except (KeyError, AssertionError):
-                if len(cache) >= lru_size:
-                    cache.popitem(last=False)
-                r = cache[key] = (
-                    obj(*args, **kwargs),
-                    datetime.datetime.utcnow() + datetime.timedelta(
-                        seconds=cache_ttl)
-                )
-            if r[0]:
+        cache = instance._cache
+        kargs = list(args)
+        kargs[0] = id(instance)
+        key = str((kargs, kwargs))
+        tracer = getattr(instance, '_cache_tracer', None)
+        hooks = getattr(instance, '_cache_hooks', None)
+        now = datetime.datetime.utcnow()
+        lock = _lock_for(cache)
+        r = cache.get(key)
+        if r is not None:
+            if r[1] > now:
+                _touch(cache, lock, key)
+                if tracer is not None:
+                    tracer.record(key, True)
                 return r[0]
-        return obj(*args, **kwargs)
+            with lock:
+                #: Another thread may have replaced the expired entry
+                expired = cache.get(key) is r
+                if expired:
+                    del cache[key]
+            if expired and hooks is not None:
+                hooks.on_evict(key, r[0])
+        start = time.perf_counter()
+        r = obj(*args, **kwargs)
+        if tracer is not None:
+            tracer.record(key, False, time.perf_counter() - start)
+        if isinstance(r, expiring):
+            expires = r.expires_at(now, cache_ttl)
+            r = r.value
+        else:
+            expires = _expires_at(now, cache_ttl)
+        if expires is not None and expires > now:
+            evicted = None
+            with lock:
+                if len(cache) >= lru_size and key not in cache:
+                    evicted = cache.popitem(last=False)
+                cache[key] = (r, expires)
+            if hooks is not None:
+                if evicted is not None:
+                    hooks.on_evict(evicted[0], evicted[1][0])
+                hooks.on_update(key, r)
+        return r
     return memoizer
 
 
@@ -187,12 +511,19 @@ class DictProperty(object):
         Copyright (c) 2014, Marcel Hellkamp
     """
 
-    def __init__(self, attr, key=None, read_only=False):
+    def __init__(self, attr, key=None, read_only=False, compressor=None,
+                 tracer=None, hooks=None):
         """ @attr: the local attribute name
             @key: the keyname to store in @attr
             @read_only: prevents setting this value if True
+            @compressor: optional :class:Compressor for large values
+            @tracer: optional :class:TraceRecorder
+            @hooks: optional :class:CacheHooks
         """
         self.attr, self.key, self.read_only = attr, key, read_only
+        self.compressor = compressor
+        self.tracer = tracer
+        self.hooks = hooks
         self.getter = None
 
     def __call__(self, func):
@@ -204,19 +535,54 @@ class DictProperty(object):
         if obj is None:
             return self
         key, storage = self.key, getattr(obj, self.attr)
+        compressor, tracer = self.compressor, self.tracer
         if key not in storage:
-            storage[key] = self.getter(obj)
+            if tracer is None:
+                value = self.getter(obj)
+            else:
+                start = time.perf_counter()
+                value = self.getter(obj)
+                #: The storage belongs to @obj, so its traced key does too
+                tracer.record(
+                    (id(obj), key), False, time.perf_counter() - start)
+            stored = value if compressor is None else \
+                compressor.compress(value)
+            if storage.setdefault(key, stored) is not stored:
+                #: Another thread computed the value first
+                value = storage[key]
+                return value if compressor is None else \
+                    compressor.decompress(value)
+            if self.hooks is not None:
+                self.hooks.on_update(key, value)
+            return value
+        if tracer is not None:
+            tracer.record((id(obj), key), True)
+        if compressor is not None:
+            return compressor.decompress(storage[key])
         return storage[key]
 
     def __set__(self, obj, value):
         if self.read_only:
             raise AttributeError("Read-Only property.")
-        getattr(obj, self.attr)[self.key] = value
+        if self.compressor is not None:
+            getattr(obj, self.attr)[self.key] = \
+                self.compressor.compress(value)
+        else:
+            getattr(obj, self.attr)[self.key] = value
+        if self.hooks is not None:
+            self.hooks.on_update(self.key, value)
 
     def __delete__(self, obj):
         if self.read_only:
             raise AttributeError("Read-Only property.")
-        del getattr(obj, self.attr)[self.key]
+        storage = getattr(obj, self.attr)
+        if self.hooks is None:
+            del storage[self.key]
+        else:
+            value = storage.pop(self.key)
+            if self.compressor is not None:
+                value = self.compressor.decompress(value)
+            self.hooks.on_evict(self.key, value)
 
 
 class cached_property(object):
@@ -251,6 +617,11 @@ class memoize(object):
         you cache functions with object arguments without unique __repr__()'s.
         If you need argument-safe memoization, use :class:pickle_memoize
         which pickles the key.
+
+        Large #str and #bytes values can be stored compressed by passing
+        a :class:Compressor as @compressor, or by using :class:zlib_memoize.
+        Accesses can be recorded by passing a :class:TraceRecorder as
+        @tracer and updates observed by passing :class:CacheHooks as @hooks.
         ..
         class Foo(object):
 
@@ -259,11 +630,14 @@ class memoize(object):
                 pass
         ..
     """
-    __slots__ = ('obj',)
+    __slots__ = ('obj', 'compressor', 'tracer', 'hooks')
     data = {}
 
-    def __init__(self, obj):
+    def __init__(self, obj, compressor=None, tracer=None, hooks=None):
         self.obj = obj
+        self.compressor = compressor
+        self.tracer = tracer
+        self.hooks = hooks
 
     def _key(self, args, kwargs):
         return str((args, kwargs))
@@ -274,11 +648,31 @@ class memoize(object):
     def __call__(self, *args, **kwargs):
         cache = self.data
         key = self._key(args, kwargs)
+        compressor, tracer = self.compressor, self.tracer
         try:
-            return dict.__getitem__(cache, key)
+            r = dict.__getitem__(cache, key)
         except KeyError:
-            dict.__setitem__(cache, key, self.obj(*args, **kwargs))
-            return dict.__getitem__(cache, key)
+            if tracer is None:
+                r = self.obj(*args, **kwargs)
+            else:
+                start = time.perf_counter()
+                r = self.obj(*args, **kwargs)
+                tracer.record(key, False, time.perf_counter() - start)
+            stored = r if compressor is None else compressor.compress(r)
+            #: setdefault is atomic, so when several threads miss on the
+            #  same key concurrently they all return the first result stored
+            current = dict.setdefault(cache, key, stored)
+            if current is stored:
+                if self.hooks is not None:
+                    self.hooks.on_update(key, r)
+                return r
+            r = current
+        else:
+            if tracer is not None:
+                tracer.record(key, True)
+        if compressor is not None:
+            return compressor.decompress(r)
+        return r
 
     def __get__(self, obj, objtype):
         '''Support instance methods.'''
@@ -300,6 +694,536 @@ class pickle_memoize(memoize):
         return high_pickle.dumps((args, kwargs))
 
 
+def _digest_buffer(obj, digest_size=20):
+    """ -> #str content hash of a buffer-protocol object @obj, or @obj
+            itself if it does not support the buffer protocol
+    """
+    try:
+        view = memoryview(obj)
+    except TypeError:
+        return obj
+    with view:
+        if view.c_contiguous:
+            digest = hashlib.blake2b(view.cast('B'), digest_size=digest_size)
+        else:
+            digest = hashlib.blake2b(view.tobytes(), digest_size=digest_size)
+        return '<%s %s%s %s>' % (
+            obj.__class__.__name__, view.format, view.shape,
+            digest.hexdigest())
+
+
+class _DigestCache(object):
+    """ FIFO of the digests of #bytes objects keyed by their identity. The
+        objects are kept alive so that their IDs are not reused, bounded by
+        both their number and their total size in bytes.
+    """
+    __slots__ = ('maxsize', 'maxbytes', 'nbytes', '_data', '_lock')
+
+    def __init__(self, maxsize, maxbytes):
+        """ @maxsize: #int maximum number of objects to keep
+            @maxbytes: #int maximum total size of the objects to keep,
+                larger objects are never kept
+        """
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, obj):
+        entry = self._data.get(id(obj))
+        if entry is not None and entry[0] is obj:
+            return entry[1]
+        return None
+
+    def set(self, obj, digest):
+        size = len(obj)
+        if size > self.maxbytes:
+            return
+        with self._lock:
+            data = self._data
+            entry = data.pop(id(obj), None)
+            if entry is not None:
+                self.nbytes -= len(entry[0])
+            while data and (len(data) >= self.maxsize or
+                            self.nbytes + size > self.maxbytes):
+                self.nbytes -= len(data.pop(next(iter(data)))[0])
+            data[id(obj)] = (obj, digest)
+            self.nbytes += size
+
+    def __len__(self):
+        return len(self._data)
+
+
+class hash_memoize(memoize):
+    """ The same as :class:memoize, but arguments which support the buffer
+        protocol (#bytes, #bytearray, #memoryview, NumPy arrays) are keyed
+        by a |blake2b| hash of their contents over a zero-copy
+        :class:memoryview rather than by their #str representation.
+
+        Hashes of #bytes arguments are cached by identity, so repeated calls
+        with the same object do not rehash it. The cache keeps the most
+        recent of these objects alive, at most 64 of them and 16MB in total.
+        ..
+        class Foo:
+            @hash_memoize
+            def expensive_func(self, payload):
+                ....
+        ..
+    """
+    __slots__ = ('obj',)
+    digests = _DigestCache(64, 16 * 1024 * 1024)
+
+    def _digest(self, arg):
+        if arg.__class__ is not bytes:
+            return _digest_buffer(arg)
+        digests = self.digests
+        digest = digests.get(arg)
+        if digest is None:
+            digest = _digest_buffer(arg)
+            digests.set(arg, digest)
+        return digest
+
+    def _key(self, args, kwargs):
+        digest = self._digest
+        return str((
+            tuple(digest(arg) for arg in args),
+            {k: digest(v) for k, v in kwargs.items()}))
+
+
+class zlib_memoize(memoize):
+    """ The same as :class:memoize, but #str and #bytes values larger than
+        :attr:zlib_compressor.threshold are stored zlib compressed and
+        decompressed on hit.
+        ..
+        class Foo:
+            @zlib_memoize
+            def render(self, template):
+                ....
+
+        zlib_compressor.stats()
+        ..
+    """
+    __slots__ = ('obj',)
+
+    def __init__(self, obj, compressor=None, tracer=None, hooks=None):
+        memoize.__init__(
+            self, obj, compressor or zlib_compressor, tracer, hooks)
+
+
+class _ReplayBuffer(object):
+    """ Records the items pulled from a live iterator so that they can be
+        replayed to any number of consumers.
+    """
+    __slots__ = ('source', 'items', 'maxlen', 'lock', 'restart', 'overflow',
+                 'error', 'discard')
+
+    def __init__(self, source, maxlen, restart, discard=None):
+        """ @source: the live iterator
+            @maxlen: #int maximum number of items to record
+            @restart: callable which returns a fresh copy of @source
+            @discard: callable which drops the buffer from the cache
+        """
+        self.source = source
+        self.items = []
+        self.maxlen = maxlen
+        self.lock = threading.Lock()
+        self.restart = restart
+        self.overflow = False
+        self.error = None
+        self.discard = discard
+
+    def __iter__(self):
+        items = self.items
+        i = 0
+        while True:
+            try:
+                yield items[i]
+                i += 1
+                continue
+            except IndexError:
+                pass
+            with self.lock:
+                if i < len(items):
+                    #: Another consumer recorded this item while we waited
+                    continue
+                source = self.source
+                if source is None:
+                    if self.error is not None:
+                        #: The live source failed, the recorded items are
+                        #  not the complete sequence
+                        raise self.error
+                    break
+                try:
+                    item = next(source)
+                except StopIteration:
+                    self.source = None
+                    return
+                except Exception as e:
+                    self.source = None
+                    self.error = e
+                    if self.discard is not None:
+                        self.discard()
+                    raise
+                claimed = len(items) >= self.maxlen
+                if not claimed:
+                    items.append(item)
+                else:
+                    #: The buffer is full, this consumer takes ownership of
+                    #  the live source and the buffer stops recording
+                    self.source = None
+                    self.overflow = True
+            yield item
+            i += 1
+            if claimed:
+                yield from source
+                return
+        if self.overflow:
+            #: The live source was claimed by a consumer which outran the
+            #  buffer, so a fresh copy is started and fast-forwarded past
+            #  the replayed items
+            source = self.restart()
+            for _ in range(i):
+                next(source, None)
+            yield from source
+
+    def close(self):
+        """ Closes the live source when the buffer is dropped from the
+            cache. Consumers which have not reached the end of the recorded
+            items continue from a fresh copy of the source.
+        """
+        with self.lock:
+            source, self.source = self.source, None
+            if source is None:
+                return
+            self.overflow = True
+        close = getattr(source, 'close', None)
+        if close is not None:
+            close()
+
+
+def replay_memoize(maxlen=1024, tracer=None, maxsize=128):
+    """ Memoizes functions which return generators or other iterators.
+        The items the first consumer pulls from the iterator are lazily
+        recorded, later callers replay the recorded items and then continue
+        from the live source. Return values which are not iterators are
+        cached as is.
+
+        The cache key is the #str representation of the #tuple (args, kwargs)
+        the cached function receives, as in :class:memoize.
+
+        @maxlen: #int maximum number of items to record per call. Once a
+            consumer pulls past @maxlen the call is dropped from the cache
+            and the next caller invokes the function again. Consumers which
+            are already replaying and fall behind re-invoke the function and
+            skip past the items they have already yielded.
+            If the live source raises, the call is dropped from the cache
+            and consumers replaying it receive the same exception once they
+            reach the end of the recorded items.
+        @tracer: optional :class:TraceRecorder, the recorded cost of a miss
+            is the time taken to create the iterator
+        @maxsize: #int maximum number of calls to cache. The least recently
+            used call is dropped once it is exceeded and its live source,
+            if any, is closed, e.g. closing the file of a generator which
+            was not consumed to the end.
+        ..
+            from vital.cache import replay_memoize
+
+            @replay_memoize(maxlen=10000)
+            def parsed_lines(path):
+                with open(path) as f:
+                    for line in f:
+                        yield parse(line)
+
+            for line in parsed_lines('/var/log/app.log'):
+                pass
+            # Replays the recorded lines
+            for line in parsed_lines('/var/log/app.log'):
+                pass
+        ..
+    """
+    def decorator(obj):
+        cache = collections.OrderedDict()
+        lock = threading.Lock()
+
+        @wraps(obj)
+        def memoizer(*args, **kwargs):
+            key = str((args, kwargs))
+            r = cache.get(key, _miss)
+            if r is not _miss:
+                _touch(cache, lock, key)
+                if tracer is not None:
+                    tracer.record(key, True)
+            else:
+                start = time.perf_counter()
+                r = obj(*args, **kwargs)
+                if tracer is not None:
+                    tracer.record(key, False, time.perf_counter() - start)
+                if hasattr(r, '__next__'):
+                    r = _ReplayBuffer(
+                        r, maxlen, partial(_restart, obj, args, kwargs))
+                    r.discard = partial(_discard, cache, lock, key, r)
+                evicted = []
+                with lock:
+                    r = cache.setdefault(key, r)
+                    while len(cache) > maxsize:
+                        evicted.append(cache.popitem(last=False)[1])
+                #: Closed outside of the cache lock, buffers take it while
+                #  holding their own lock in :meth:_ReplayBuffer.__iter__
+                for buffer in evicted:
+                    if isinstance(buffer, _ReplayBuffer):
+                        buffer.close()
+            if isinstance(r, _ReplayBuffer):
+                if r.overflow:
+                    #: The buffer overflowed, stop handing it out
+                    with lock:
+                        if cache.get(key) is r:
+                            del cache[key]
+                return iter(r)
+            return r
+        memoizer.cache = cache
+        return memoizer
+    return decorator
+
+
+def _restart(obj, args, kwargs):
+    return iter(obj(*args, **kwargs))
+
+
+def _discard(cache, lock, key, buffer):
+    with lock:
+        if cache.get(key) is buffer:
+            del cache[key]
+
+
+class _GDSFCache(object):
+    """ Greedy-Dual-Size-Frequency cache engine. Each entry's priority is
+        |L + frequency * cost / size| where |L| is the priority of the last
+        evicted entry, so entries which are cheap to recompute per unit of
+        size are evicted first and idle entries age out as |L| rises.
+    """
+    __slots__ = (
+        'maxsize', 'sizeof', 'entries', 'heap', 'inflation', 'total_size',
+        'counter', 'lock', 'hits', 'misses', 'evictions', 'saved_time',
+        'hooks')
+
+    def __init__(self, maxsize, sizeof=None, hooks=None):
+        self.maxsize = maxsize
+        if sizeof is True:
+            sizeof = sys.getsizeof
+        self.sizeof = sizeof
+        self.hooks = hooks
+        #: key -> [value, frequency, cost, size, priority]
+        self.entries = {}
+        self.heap = []
+        self.inflation = 0.0
+        self.total_size = 0
+        self.counter = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_time = 0.0
+
+    def _push(self, key, entry):
+        entry[4] = self.inflation + entry[1] * entry[2] / entry[3]
+        self.counter += 1
+        heapq.heappush(self.heap, (entry[4], self.counter, key))
+
+    def get(self, key):
+        """ -> the value cached under @key
+            !KeyError if @key is not cached
+        """
+        with self.lock:
+            entry = self.entries[key]
+            entry[1] += 1
+            self.hits += 1
+            self.saved_time += entry[2]
+            self._push(key, entry)
+            if len(self.heap) > 2 * len(self.entries) + 64:
+                self._compact()
+            return entry[0]
+
+    def set(self, key, value, cost):
+        """ Caches @value under @key, @cost is the #float seconds it took
+            to compute
+        """
+        size = self.sizeof(value) if self.sizeof is not None else 1
+        size = max(size, 1)
+        evicted = []
+        with self.lock:
+            self.misses += 1
+            if key in self.entries or size > self.maxsize:
+                return
+            entry = [value, 1, max(cost, 1e-9), size, 0.0]
+            self.entries[key] = entry
+            self.total_size += size
+            self._push(key, entry)
+            while self.total_size > self.maxsize:
+                evicted.append(self._evict())
+        if self.hooks is not None:
+            for k, v in evicted:
+                self.hooks.on_evict(k, v)
+            self.hooks.on_update(key, value)
+
+    def _evict(self):
+        entries, heap = self.entries, self.heap
+        while True:
+            priority, _, key = heapq.heappop(heap)
+            entry = entries.get(key)
+            if entry is not None and entry[4] == priority:
+                break
+        del entries[key]
+        self.total_size -= entry[3]
+        self.inflation = priority
+        self.evictions += 1
+        return key, entry[0]
+
+    def _compact(self):
+        self.heap = [
+            (entry[4], i, key)
+            for i, (key, entry) in enumerate(self.entries.items())]
+        heapq.heapify(self.heap)
+        self.counter = len(self.heap)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.heap = []
+            self.total_size = 0
+            self.inflation = 0.0
+
+    def info(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'saved_time': self.saved_time,
+            'entries': len(self.entries),
+            'size': self.total_size,
+            'maxsize': self.maxsize
+        }
+
+
+def gdsf_cache(maxsize=1024, sizeof=None, tracer=None, hooks=None):
+    """ Cost-aware memoization using the Greedy-Dual-Size-Frequency policy.
+        The time each miss takes to compute is measured, and the entries
+        which are cheapest to recompute per unit of size are evicted first,
+        so the cache maximizes the compute time it saves rather than its
+        raw hit count.
+
+        The cache key is the #str representation of the #tuple (args, kwargs)
+        the cached function receives, as in :class:memoize.
+
+        @maxsize: #int capacity of the cache, in number of entries or in
+            units of @sizeof if it is given
+        @sizeof: callable which returns the size of a value, or |True| to
+            use :func:sys.getsizeof. Values larger than @maxsize are not
+            cached.
+        @tracer: optional :class:TraceRecorder
+        @hooks: optional :class:CacheHooks
+        ..
+            from vital.cache import gdsf_cache
+
+            @gdsf_cache(maxsize=64 * 1024 * 1024, sizeof=len)
+            def render(template, context):
+                pass
+
+            render.cache_info()
+            # -> {'hits': 9120, 'misses': 880, 'evictions': 410,
+            #     'saved_time': 38.2, 'entries': 470, 'size': 66912448,
+            #     'maxsize': 67108864}
+        ..
+    """
+    def decorator(obj):
+        cache = _GDSFCache(maxsize, sizeof, hooks)
+
+        @wraps(obj)
+        def memoizer(*args, **kwargs):
+            key = str((args, kwargs))
+            try:
+                r = cache.get(key)
+                if tracer is not None:
+                    tracer.record(key, True)
+                return r
+            except KeyError:
+                pass
+            start = time.perf_counter()
+            r = obj(*args, **kwargs)
+            cost = time.perf_counter() - start
+            if tracer is not None:
+                tracer.record(key, False, cost)
+            cache.set(key, r, cost)
+            return r
+        memoizer.cache_info = cache.info
+        memoizer.cache_clear = cache.clear
+        return memoizer
+    return decorator
+
+
+def file_memoize(interval=1.0, mmap_threshold=None, argnum=0):
+    """ Memoizes loaders of files such as configs, templates and lookup
+        tables. Results are keyed by the path and the rest of the arguments
+        and the file is checked with :func:os.stat at most once every
+        @interval seconds. The loader is only called again when the file's
+        mtime, size or inode change.
+
+        @interval: #float minimum seconds between :func:os.stat checks
+        @mmap_threshold: #int files at least this many bytes are passed to
+            the loader as a read-only :class:mmap.mmap instead of a path.
+            |None| never maps files.
+        @argnum: #int position of the path in the loader's arguments, e.g.
+            |1| for methods
+        ..
+            from vital.cache import file_memoize
+
+            @file_memoize(interval=2)
+            def load_config(path):
+                with open(path) as f:
+                    return json.load(f)
+
+            @file_memoize(interval=5, mmap_threshold=1024 * 1024)
+            def load_table(path_or_map):
+                return parse_table(path_or_map)
+        ..
+    """
+    def decorator(obj):
+        #: key -> [result, (mtime, size, inode), last checked]
+        cache = {}
+
+        @wraps(obj)
+        def memoizer(*args, **kwargs):
+            key = str((args, kwargs))
+            now = time.monotonic()
+            entry = cache.get(key)
+            if entry is not None and now - entry[2] < interval:
+                return entry[0]
+            path = args[argnum]
+            try:
+                st = os.stat(path)
+            except OSError:
+                cache.pop(key, None)
+                raise
+            signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+            if entry is not None and entry[1] == signature:
+                entry[2] = now
+                return entry[0]
+            if mmap_threshold is not None and \
+               st.st_size >= max(mmap_threshold, 1):
+                with open(path, 'rb') as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                margs = list(args)
+                margs[argnum] = mapped
+                r = obj(*margs, **kwargs)
+            else:
+                r = obj(*args, **kwargs)
+            cache[key] = [r, signature, now]
+            return r
+        memoizer.cache_clear = cache.clear
+        return memoizer
+    return decorator
+
+
 #
 #  ``Serialization``
 #
@@ -320,11 +1244,11 @@ class _pickle:
     def loads(self, data):
         return pickle.loads(data, encoding="utf-8")
 
-    def dump(self, data):
-        return pickle.dump(data, self.protocol)
+    def dump(self, data, file):
+        return pickle.dump(data, file, self.protocol)
 
-    def load(self, data):
-        return pickle.load(dataa, encoding="utf-8")
+    def load(self, file):
+        return pickle.load(file, encoding="utf-8")
 
 
 sweet_pickle = _pickle(3)
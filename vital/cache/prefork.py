@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+
+   `Vital pre-fork cache warmup`
+    Tools for warming caches in a pre-forking server's master process so that
+    the cached objects stay shared copy-on-write with the workers
+--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--
+    The MIT License (MIT) (c) 2016 Jared Lunde
+
+"""
+import gc
+import os
+import sys
+
+from vital.cache.decorators import memoize
+
+
+__all__ = (
+  'prefork_warmup',
+  'compact_cache',
+  'FrozenCache',
+  'shared_memory',
+  'shared_memory_report'
+)
+
+
+class FrozenCache(dict):
+    """ A read-only snapshot of a dict cache with a per-process overlay.
+        Lookups fall through to the frozen @base, while new entries are
+        written into this (initially empty) dict, so workers forked after
+        the snapshot never write to the pages the shared entries live on.
+    """
+    __slots__ = ('base',)
+
+    def __init__(self, base):
+        """ @base: #dict of warmed entries """
+        dict.__init__(self)
+        self.base = base
+
+    def __missing__(self, key):
+        return self.base[key]
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self.base
+
+    def __len__(self):
+        return dict.__len__(self) + len(self.base)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+def compact_cache(cache):
+    """ Rebuilds the dict-like @cache in place so that its hash table is
+        exactly sized and its #str keys are interned. Insertion order is
+        preserved, so :class:collections.OrderedDict LRUs keep their order.
+
+        -> @cache
+    """
+    items = [
+        (sys.intern(key) if key.__class__ is str else key, value)
+        for key, value in cache.items()]
+    cache.clear()
+    cache.update(items)
+    return cache
+
+
+_fork_hook_registered = False
+
+
+def _register_fork_hook():
+    global _fork_hook_registered
+    if not _fork_hook_registered and hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=gc.enable)
+        _fork_hook_registered = True
+
+
+def prefork_warmup(*warmers, caches=(), freeze_memoize=True, freeze=True,
+                   enable_gc=False):
+    """ Warms caches in the master process of a pre-forking server such as
+        gunicorn and prepares them to be shared with the forked workers.
+
+        1. The garbage collector is disabled so that warming does not leave
+           freed holes in the pages the cached objects live on.
+        2. Each of @warmers is called.
+        3. :class:memoize's table is snapshotted into a :class:FrozenCache
+           and each of @caches is compacted with :func:compact_cache.
+        4. :func:gc.freeze moves every tracked object into the permanent
+           generation, so collections in the workers never write to their
+           headers. The collector is re-enabled in each forked child.
+
+        With @freeze the collector stays disabled in the calling process,
+        as recommended for a master which only forks workers. Outside of a
+        pre-fork master, e.g. in a script, a test or a single process
+        server, pass @enable_gc or call :func:gc.enable afterwards,
+        otherwise cyclic garbage is never collected in that process.
+
+        @warmers: callables which populate the caches
+        @caches: dict-like caches to compact, e.g. |instance._cache| of
+            :func:local_lru or the |cache| attribute of functions decorated
+            with :func:replay_memoize
+        @freeze_memoize: #bool whether or not to snapshot :class:memoize's
+            table into a :class:FrozenCache
+        @freeze: #bool whether or not to call :func:gc.freeze
+        @enable_gc: #bool whether or not to re-enable the collector in the
+            calling process after freezing
+        ..
+            # gunicorn.conf.py
+            from vital.cache.prefork import prefork_warmup
+
+            def on_starting(server):
+                prefork_warmup(load_templates, load_geoip_table)
+        ..
+    """
+    gc.disable()
+    try:
+        for warmer in warmers:
+            warmer()
+        if freeze_memoize:
+            data = memoize.data
+            if isinstance(data, FrozenCache):
+                base = dict(data.base)
+                base.update(data)
+            else:
+                base = data
+            memoize.data = FrozenCache(compact_cache(base))
+        for cache in caches:
+            compact_cache(cache)
+    finally:
+        if freeze and hasattr(gc, 'freeze'):
+            gc.freeze()
+            _register_fork_hook()
+            if enable_gc:
+                gc.enable()
+        else:
+            gc.enable()
+
+
+_SMAPS_FIELDS = {
+    'Rss': 'rss',
+    'Pss': 'pss',
+    'Shared_Clean': 'shared_clean',
+    'Shared_Dirty': 'shared_dirty',
+    'Private_Clean': 'private_clean',
+    'Private_Dirty': 'private_dirty'
+}
+
+
+def shared_memory(pid=None):
+    """ Reads the memory sharing statistics of process @pid from
+        |/proc/<pid>/smaps_rollup|, or |/proc/<pid>/smaps| on older kernels.
+        Linux only.
+
+        @pid: #int process id, defaults to the current process
+
+        -> #dict of |rss|, |pss|, |shared_clean|, |shared_dirty|,
+            |private_clean| and |private_dirty| in bytes and |shared_ratio|,
+            the fraction of the resident set still shared with other
+            processes
+    """
+    pid = pid or os.getpid()
+    stats = dict.fromkeys(_SMAPS_FIELDS.values(), 0)
+    path = '/proc/%d/smaps_rollup' % pid
+    if not os.path.exists(path):
+        path = '/proc/%d/smaps' % pid
+    with open(path) as f:
+        for row in f:
+            field, _, value = row.partition(':')
+            name = _SMAPS_FIELDS.get(field)
+            if name is not None:
+                stats[name] += int(value.split()[0]) * 1024
+    shared = stats['shared_clean'] + stats['shared_dirty']
+    stats['shared_ratio'] = shared / stats['rss'] if stats['rss'] else 0.0
+    return stats
+
+
+def shared_memory_report(pids):
+    """ -> #dict of {pid: :func:shared_memory} for each of the worker @pids,
+            e.g. after warming the master with :func:prefork_warmup
+    """
+    return {pid: shared_memory(pid) for pid in pids}
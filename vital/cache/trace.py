@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+
+   `Vital cache access tracing`
+    Records the access pattern of a cache into a compact binary trace file
+    which can be replayed through :mod:vital.debug.cachesim
+--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--
+    The MIT License (MIT) (c) 2016 Jared Lunde
+
+    Trace file format
+    ..
+        header: b'VTRC' + #uint8 format version
+        record: little-endian |<dQBf|, 21 bytes
+            #float64 unix timestamp of the access
+            #uint64 |blake2b| hash of the cache key
+            #uint8 flags, bit 0 is set on hits
+            #float32 seconds spent computing the value on misses
+    ..
+
+"""
+import time
+import struct
+import hashlib
+import threading
+
+
+__all__ = ('TraceRecorder', 'read_trace', 'hash_key')
+
+
+MAGIC = b'VTRC'
+VERSION = 1
+HEADER = struct.Struct('<4sB')
+RECORD = struct.Struct('<dQBf')
+HIT = 1
+
+
+def hash_key(key):
+    """ -> #int 64-bit hash of the cache @key which is stable across
+            processes
+    """
+    if isinstance(key, str):
+        key = key.encode('utf-8', 'surrogatepass')
+    elif not isinstance(key, (bytes, bytearray, memoryview)):
+        key = repr(key).encode('utf-8', 'surrogatepass')
+    return int.from_bytes(
+        hashlib.blake2b(key, digest_size=8).digest(), 'little')
+
+
+class TraceRecorder(object):
+    """ Records cache accesses into a binary trace file at @path. Records
+        are packed into an in-memory buffer and written out once
+        @buffer_size records have accumulated, so the cost of each access
+        is a hash and a :meth:struct.Struct.pack_into.
+
+        Pass the recorder as the @tracer of :class:vital.cache.memoize,
+        :class:vital.cache.DictProperty or :func:vital.cache.replay_memoize,
+        or set it as |self._cache_tracer| for :func:vital.cache.local_lru
+        and :func:vital.cache.local_expiring_lru.
+        ..
+            from vital.cache import memoize, TraceRecorder
+
+            tracer = TraceRecorder('/tmp/render.trace')
+
+            @partial(memoize, tracer=tracer)
+            def render(template):
+                pass
+
+            tracer.close()
+        ..
+    """
+
+    def __init__(self, path, buffer_size=4096):
+        """ @path: #str path of the trace file, new records are appended
+                to existing traces
+            @buffer_size: #int number of records to buffer before writing
+        """
+        self.path = path
+        self.buffer_size = buffer_size
+        self._buffer = bytearray(RECORD.size * buffer_size)
+        self._pos = 0
+        self._lock = threading.Lock()
+        self._file = open(path, 'ab')
+        if not self._file.tell():
+            self._file.write(HEADER.pack(MAGIC, VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, key, hit, cost=0.0):
+        """ Records an access to @key
+            @key: the cache key
+            @hit: #bool |True| if the key was found in the cache
+            @cost: #float seconds spent computing the value on a miss
+        """
+        record = (time.time(), hash_key(key), HIT if hit else 0, cost)
+        with self._lock:
+            RECORD.pack_into(self._buffer, self._pos, *record)
+            self._pos += RECORD.size
+            if self._pos >= len(self._buffer):
+                self._write()
+
+    def _write(self):
+        if self._pos and self._file is not None:
+            self._file.write(memoryview(self._buffer)[:self._pos])
+        self._pos = 0
+
+    def flush(self):
+        """ Writes the buffered records to the trace file """
+        with self._lock:
+            self._write()
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        """ Flushes and closes the trace file """
+        with self._lock:
+            self._write()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_trace(path):
+    """ Yields (timestamp, key_hash, hit, cost) #tuple records from the trace
+        file at @path
+    """
+    with open(path, 'rb') as f:
+        magic, version = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('%r is not a vital.cache trace file' % path)
+        chunk_size = RECORD.size * 4096
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            #: Ignore a partially written trailing record
+            end = len(data) - len(data) % RECORD.size
+            for ts, key, flags, cost in RECORD.iter_unpack(data[:end]):
+                yield ts, key, bool(flags & HIT), cost
@@ -0,0 +1,449 @@
+# -*- coding: utf-8 -*-
+"""
+
+   `Vital write-behind cache`
+    An in-process store which is the system of record for hot writes and
+    flushes them to persistent storage in batches
+--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--
+    The MIT License (MIT) (c) 2016 Jared Lunde
+
+"""
+import os
+import time
+import atexit
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from vital.cache.decorators import CacheHooks, high_pickle
+
+
+__all__ = ('WriteBehindStore', 'SqliteBackend', 'FileBackend')
+
+
+_DELETED = object()
+_MISSING = object()
+
+
+#
+#  ``Backends``
+#
+class SqliteBackend(object):
+    """ Stores pickled values in a sqlite table """
+
+    def __init__(self, path, table='vital_cache', serializer=high_pickle,
+                 expires=None):
+        """ @path: #str path of the sqlite database
+            @table: #str name of the table to store values in
+            @serializer: object with |dumps| and |loads| methods
+            @expires: callable returning the #float unix time a value
+                expires at, or |None| if it never expires. The expiry is
+                kept in its own indexed column, so :meth:purge deletes
+                expired rows without loading them.
+        """
+        self.path = path
+        self.table = table
+        self.serializer = serializer
+        self.expires = expires
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS "%s" '
+                '(key PRIMARY KEY, value BLOB)' % table)
+            if expires is not None:
+                columns = {row[1] for row in self._conn.execute(
+                    'PRAGMA table_info("%s")' % table)}
+                if 'expires' not in columns:
+                    self._conn.execute(
+                        'ALTER TABLE "%s" ADD COLUMN expires REAL' % table)
+                self._conn.execute(
+                    'CREATE INDEX IF NOT EXISTS "%s_expires" ON "%s" '
+                    '(expires)' % (table, table))
+
+    def load(self, key):
+        """ -> the value stored under @key
+            !KeyError if @key is not stored
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value FROM "%s" WHERE key = ?' % self.table,
+                (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return self.serializer.loads(row[0])
+
+    def write_many(self, items):
+        """ Stores the (key, value) pairs of @items in one transaction """
+        dumps = self.serializer.dumps
+        expires = self.expires
+        if expires is None:
+            items = [(key, dumps(value)) for key, value in items]
+            sql = 'INSERT OR REPLACE INTO "%s" (key, value) VALUES (?, ?)'
+        else:
+            items = [(key, dumps(value), expires(value))
+                     for key, value in items]
+            sql = 'INSERT OR REPLACE INTO "%s" (key, value, expires) ' \
+                'VALUES (?, ?, ?)'
+        with self._lock, self._conn:
+            self._conn.executemany(sql % self.table, items)
+
+    def delete_many(self, keys):
+        """ Deletes @keys in one transaction """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'DELETE FROM "%s" WHERE key = ?' % self.table,
+                ((key,) for key in keys))
+
+    def purge(self, now=None):
+        """ Deletes the values which expired by the unix time @now,
+            defaulting to the current time
+
+            -> #int number of values deleted
+        """
+        if self.expires is None:
+            return 0
+        with self._lock, self._conn:
+            return self._conn.execute(
+                'DELETE FROM "%s" WHERE expires <= ?' % self.table,
+                (time.time() if now is None else now,)).rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class FileBackend(object):
+    """ Stores all values in a single pickle file at @path which is
+        atomically replaced on each write
+    """
+
+    def __init__(self, path, serializer=high_pickle, expires=None):
+        """ @path: #str path of the pickle file
+            @serializer: object with |dump| and |load| methods
+            @expires: callable returning the #float unix time a value
+                expires at, or |None| if it never expires, see :meth:purge
+        """
+        self.path = path
+        self.serializer = serializer
+        self.expires = expires
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'rb') as f:
+                self._data = serializer.load(f)
+        except FileNotFoundError:
+            self._data = {}
+
+    def load(self, key):
+        """ -> the value stored under @key
+            !KeyError if @key is not stored
+        """
+        with self._lock:
+            return self._data[key]
+
+    def _write(self):
+        tmp = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(tmp, 'wb') as f:
+            self.serializer.dump(self._data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def write_many(self, items):
+        """ Stores the (key, value) pairs of @items """
+        with self._lock:
+            self._data.update(items)
+            self._write()
+
+    def delete_many(self, keys):
+        """ Deletes @keys """
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+            self._write()
+
+    def purge(self, now=None):
+        """ Deletes the values which expired by the unix time @now,
+            defaulting to the current time
+
+            -> #int number of values deleted
+        """
+        expires = self.expires
+        if expires is None:
+            return 0
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = []
+            for key, value in self._data.items():
+                at = expires(value)
+                if at is not None and at <= now:
+                    expired.append(key)
+            for key in expired:
+                del self._data[key]
+            if expired:
+                self._write()
+        return len(expired)
+
+    def close(self):
+        pass
+
+
+#
+#  ``Store``
+#
+class WriteBehindStore(CacheHooks):
+    """ A key-value store which keeps hot values in memory and writes
+        changes behind to a @backend. Updates are coalesced per key, so a
+        counter incremented a thousand times between flushes is written
+        once. A daemon thread flushes pending changes in batches every
+        @interval seconds, or sooner once @batch_size keys are pending, and
+        everything pending is flushed on :meth:close or interpreter exit.
+        With @purge_interval the thread also calls :meth:purge that often
+        to delete expired values from the backend.
+
+        The store is also a :class:CacheHooks, so it can be attached as the
+        @hooks of a cache engine to write that cache's updates behind.
+        ..
+            from vital.cache.write_behind import WriteBehindStore, \\
+                SqliteBackend
+
+            store = WriteBehindStore(SqliteBackend('/var/lib/app/counters.db'))
+            store['hits'] = store.get('hits', 0) + 1
+
+            @partial(memoize, hooks=store)
+            def session_state(sid):
+                pass
+        ..
+    """
+
+    def __init__(self, backend, interval=1.0, batch_size=1000, maxsize=None,
+                 purge_interval=None):
+        """ @backend: :class:SqliteBackend, :class:FileBackend or an object
+                with |load|, |write_many|, |delete_many| and |close|
+                methods, and optionally a |purge| method
+            @interval: #float seconds between flushes
+            @batch_size: #int maximum number of keys written per batch
+            @maxsize: #int maximum number of values kept in memory, the
+                least recently used values are dropped from memory and
+                pending writes of them are kept until they are flushed
+            @purge_interval: #float seconds between calls of :meth:purge,
+                |None| to only purge when it is called
+        """
+        self.backend = backend
+        self.interval = interval
+        self.batch_size = batch_size
+        self.maxsize = maxsize
+        self.purge_interval = purge_interval
+        self.data = OrderedDict()
+        self._dirty = OrderedDict()
+        #: Batch being written to the backend by :meth:flush
+        self._inflight = {}
+        #: {key: [#list of a #bool for each read of @key from the backend
+        #  in progress]}, set to |True| when the key is written meanwhile
+        self._loading = {}
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name='WriteBehindStore', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _pending_value(self, key):
+        """ -> the value of @key in memory or waiting to be written,
+                |_MISSING| if the backend has to be read
+            !KeyError if @key is waiting to be deleted
+        """
+        try:
+            value = self.data[key]
+            self.data.move_to_end(key)
+            return value
+        except KeyError:
+            pass
+        value = self._dirty.get(key, _MISSING)
+        if value is _MISSING:
+            value = self._inflight.get(key, _MISSING)
+        if value is _DELETED:
+            raise KeyError(key)
+        return value
+
+    def __getitem__(self, key):
+        while True:
+            with self._lock:
+                value = self._pending_value(key)
+                if value is not _MISSING:
+                    return value
+                stale = [False]
+                self._loading.setdefault(key, []).append(stale)
+            value = _MISSING
+            try:
+                value = self.backend.load(key)
+            except KeyError:
+                value = _MISSING
+            finally:
+                with self._lock:
+                    #: Removed by identity, other reads hold equal lists
+                    loads = [l for l in self._loading[key] if l is not stale]
+                    if loads:
+                        self._loading[key] = loads
+                    else:
+                        del self._loading[key]
+                    if not stale[0] and value is not _MISSING:
+                        self._store(key, value)
+            if not stale[0]:
+                if value is _MISSING:
+                    raise KeyError(key)
+                return value
+            #: @key was set or deleted while the backend was being read, the
+            #  loaded value may be outdated so it is read again
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        self.delete(key)
+
+    def __contains__(self, key):
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def __len__(self):
+        return len(self.data)
+
+    def _store(self, key, value):
+        data = self.data
+        data[key] = value
+        data.move_to_end(key)
+        if self.maxsize is not None:
+            while len(data) > self.maxsize:
+                data.popitem(last=False)
+
+    def get(self, key, default=None):
+        """ -> the value of @key from memory, the pending changes or the
+                backend, @default if it is not stored
+        """
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def set(self, key, value):
+        """ Sets @key to @value in memory and schedules it to be written """
+        with self._lock:
+            self._store(key, value)
+            self._mark(key, value)
+
+    def delete(self, key):
+        """ Deletes @key from memory and schedules it to be deleted """
+        with self._lock:
+            self.data.pop(key, None)
+            self._mark(key, _DELETED)
+
+    def _mark(self, key, value):
+        for stale in self._loading.get(key, ()):
+            stale[0] = True
+        dirty = self._dirty
+        dirty[key] = value
+        if len(dirty) >= self.batch_size:
+            self._wake.set()
+
+    def on_update(self, key, value):
+        """ Schedules @value to be written under @key without keeping it
+            in memory, the cache engine holds it
+        """
+        with self._lock:
+            self.data.pop(key, None)
+            self._mark(key, value)
+
+    @property
+    def pending(self):
+        """ -> #int number of keys waiting to be written """
+        return len(self._dirty)
+
+    def flush(self):
+        """ Writes all pending changes to the backend in batches of
+            :attr:batch_size
+        """
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    dirty = self._dirty
+                    if not dirty:
+                        return
+                    batch = []
+                    for _ in range(min(self.batch_size, len(dirty))):
+                        batch.append(dirty.popitem(last=False))
+                    #: Reads see the batch until the backend has it
+                    self._inflight = dict(batch)
+                writes = [(k, v) for k, v in batch if v is not _DELETED]
+                deletes = [k for k, v in batch if v is _DELETED]
+                try:
+                    if writes:
+                        self.backend.write_many(writes)
+                    if deletes:
+                        self.backend.delete_many(deletes)
+                except Exception:
+                    with self._lock:
+                        #: Requeue the batch unless the keys were
+                        #  updated again in the meantime
+                        for key, value in reversed(batch):
+                            if key not in dirty:
+                                dirty[key] = value
+                                dirty.move_to_end(key, last=False)
+                        self._inflight = {}
+                    raise
+                with self._lock:
+                    self._inflight = {}
+
+    def purge(self):
+        """ Deletes expired values from the backend if it has a |purge|
+            method, see :meth:SqliteBackend.purge
+
+            -> #int number of values deleted
+        """
+        purge = getattr(self.backend, 'purge', None)
+        return 0 if purge is None else purge()
+
+    def _run(self):
+        purged = time.monotonic()
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._closed:
+                break
+            try:
+                self.flush()
+            except Exception:
+                #: The batch was requeued, try again on the next interval
+                pass
+            if self.purge_interval is not None and \
+                    time.monotonic() - purged >= self.purge_interval:
+                purged = time.monotonic()
+                try:
+                    self.purge()
+                except Exception:
+                    pass
+
+    def close(self):
+        """ Stops the flush thread, flushes all pending changes and closes
+            the backend
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+        self.backend.close()
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
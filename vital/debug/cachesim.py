@@ -0,0 +1,411 @@
+# -*- coding: utf-8 -*-
+"""
+
+  `Vital Cache Simulator`
+   Replays access traces recorded by :class:vital.cache.TraceRecorder
+   through several eviction policies at many cache sizes
+--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--
+   The MIT License (MIT) (c) 2016 Jared Lunde
+
+"""
+from collections import OrderedDict, defaultdict
+from functools import partial
+
+from vital.cache.trace import read_trace
+from vital.debug import Timer, flag, line, bold, colorize, colors
+
+
+__all__ = (
+  "LRU",
+  "LFU",
+  "ARC",
+  "WTinyLFU",
+  "TTL",
+  "simulate",
+  "CacheSimulator"
+)
+
+
+#
+#  ``Policies``
+#
+class LRU(object):
+    """ Least recently used """
+    __slots__ = ('size', 'data')
+
+    def __init__(self, size):
+        self.size = size
+        self.data = OrderedDict()
+
+    def access(self, key, now):
+        """ -> #bool |True| if @key was cached, @key is cached afterwards """
+        data = self.data
+        if key in data:
+            data.move_to_end(key)
+            return True
+        if len(data) >= self.size:
+            data.popitem(last=False)
+        data[key] = None
+        return False
+
+
+class LFU(object):
+    """ Least frequently used, ties are broken by recency """
+    __slots__ = ('size', 'freq', 'buckets', 'min_freq')
+
+    def __init__(self, size):
+        self.size = size
+        self.freq = {}
+        self.buckets = defaultdict(OrderedDict)
+        self.min_freq = 0
+
+    def access(self, key, now):
+        freq, buckets = self.freq, self.buckets
+        f = freq.get(key)
+        if f is not None:
+            bucket = buckets[f]
+            del bucket[key]
+            if not bucket:
+                del buckets[f]
+                if self.min_freq == f:
+                    self.min_freq = f + 1
+            freq[key] = f + 1
+            buckets[f + 1][key] = None
+            return True
+        if len(freq) >= self.size:
+            bucket = buckets[self.min_freq]
+            evicted, _ = bucket.popitem(last=False)
+            if not bucket:
+                del buckets[self.min_freq]
+            del freq[evicted]
+        freq[key] = 1
+        buckets[1][key] = None
+        self.min_freq = 1
+        return False
+
+
+class ARC(object):
+    """ Adaptive replacement cache, Megiddo & Modha (2003) """
+    __slots__ = ('size', 'p', 't1', 't2', 'b1', 'b2')
+
+    def __init__(self, size):
+        self.size = size
+        self.p = 0
+        self.t1, self.t2 = OrderedDict(), OrderedDict()
+        self.b1, self.b2 = OrderedDict(), OrderedDict()
+
+    def _replace(self, in_b2):
+        t1 = self.t1
+        if t1 and (len(t1) > self.p or (in_b2 and len(t1) == self.p) or
+                   not self.t2):
+            key, _ = t1.popitem(last=False)
+            self.b1[key] = None
+        else:
+            key, _ = self.t2.popitem(last=False)
+            self.b2[key] = None
+
+    def access(self, key, now):
+        t1, t2, b1, b2 = self.t1, self.t2, self.b1, self.b2
+        if key in t1:
+            del t1[key]
+            t2[key] = None
+            return True
+        if key in t2:
+            t2.move_to_end(key)
+            return True
+        size = self.size
+        if key in b1:
+            self.p = min(size, self.p + max(len(b2) // len(b1), 1))
+            self._replace(False)
+            del b1[key]
+            t2[key] = None
+            return False
+        if key in b2:
+            self.p = max(0, self.p - max(len(b1) // len(b2), 1))
+            self._replace(True)
+            del b2[key]
+            t2[key] = None
+            return False
+        l1 = len(t1) + len(b1)
+        if l1 >= size:
+            if len(t1) < size:
+                b1.popitem(last=False)
+                self._replace(False)
+            else:
+                t1.popitem(last=False)
+        else:
+            total = l1 + len(t2) + len(b2)
+            if total >= size:
+                if total >= 2 * size:
+                    b2.popitem(last=False)
+                self._replace(False)
+        t1[key] = None
+        return False
+
+
+_HALVE = bytes(i >> 1 for i in range(256))
+
+
+class _CountMinSketch(object):
+    """ 4-bit saturating count-min sketch which halves its counters every
+        10 x @size increments
+    """
+    __slots__ = ('mask', 'rows', 'additions', 'sample_size')
+    seeds = (
+        0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F,
+        0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+
+    def __init__(self, size):
+        width = 1 << max(4, (size * 2 - 1).bit_length())
+        self.mask = width - 1
+        self.rows = [bytearray(width) for _ in self.seeds]
+        self.additions = 0
+        self.sample_size = 10 * size
+
+    def _indexes(self, key):
+        mask = self.mask
+        return [
+            (((key ^ seed) * 0x2545F4914F6CDD1D) >> 29) & mask
+            for seed in self.seeds]
+
+    def increment(self, key):
+        for row, i in zip(self.rows, self._indexes(key)):
+            if row[i] < 15:
+                row[i] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.rows = [row.translate(_HALVE) for row in self.rows]
+            self.additions //= 2
+
+    def estimate(self, key):
+        return min(row[i] for row, i in zip(self.rows, self._indexes(key)))
+
+
+class WTinyLFU(object):
+    """ Window TinyLFU, Einziger, Friedman & Manes (2017). A 1% LRU
+        admission window in front of a segmented LRU main cache, admission
+        to which is decided by a frequency sketch.
+    """
+    __slots__ = (
+        'window_size', 'main_size', 'protected_size', 'window',
+        'probation', 'protected', 'sketch')
+
+    def __init__(self, size):
+        self.window_size = max(1, size // 100)
+        self.main_size = size - self.window_size
+        self.protected_size = int(self.main_size * 0.8)
+        self.window = OrderedDict()
+        self.probation = OrderedDict()
+        self.protected = OrderedDict()
+        self.sketch = _CountMinSketch(size)
+
+    def access(self, key, now):
+        self.sketch.increment(key)
+        window, probation, protected = \
+            self.window, self.probation, self.protected
+        if key in window:
+            window.move_to_end(key)
+            return True
+        if key in protected:
+            protected.move_to_end(key)
+            return True
+        if key in probation:
+            del probation[key]
+            protected[key] = None
+            if len(protected) > self.protected_size:
+                demoted, _ = protected.popitem(last=False)
+                probation[demoted] = None
+            return True
+        window[key] = None
+        if len(window) > self.window_size:
+            candidate, _ = window.popitem(last=False)
+            if len(probation) + len(protected) < self.main_size:
+                probation[candidate] = None
+            elif self.main_size:
+                victims = probation or protected
+                victim = next(iter(victims))
+                estimate = self.sketch.estimate
+                if estimate(candidate) > estimate(victim):
+                    del victims[victim]
+                    probation[candidate] = None
+        return False
+
+
+class TTL(object):
+    """ Least recently used with a fixed time-to-live of @ttl seconds from
+        insertion
+    """
+    __slots__ = ('size', 'ttl', 'data')
+
+    def __init__(self, size, ttl=60):
+        self.size = size
+        self.ttl = ttl
+        self.data = OrderedDict()
+
+    def access(self, key, now):
+        data = self.data
+        expires = data.get(key)
+        if expires is not None:
+            if expires > now:
+                data.move_to_end(key)
+                return True
+            del data[key]
+        elif len(data) >= self.size:
+            data.popitem(last=False)
+        data[key] = now + self.ttl
+        return False
+
+
+default_policies = OrderedDict((
+    ('LRU', LRU),
+    ('LFU', LFU),
+    ('ARC', ARC),
+    ('W-TinyLFU', WTinyLFU)
+))
+
+
+#
+#  ``Simulation``
+#
+def simulate(trace, sizes, policies=None, ttls=()):
+    """ Replays @trace through each of @policies at each of @sizes
+
+        @trace: #str path of a trace file or an iterable of
+            (timestamp, key_hash, hit, cost) records
+        @sizes: iterable of #int cache sizes in number of entries
+        @policies: #dict of {name: policy class}, defaults to LRU, LFU, ARC
+            and W-TinyLFU
+        @ttls: iterable of #int or #float TTLs in seconds to additionally
+            simulate with :class:TTL
+
+        -> #list of #dict results with |policy|, |size|, |hits|,
+            |accesses|, |hit_ratio| and |saved_time| keys. |saved_time| is
+            the sum of the mean recorded compute time of each hit's key.
+    """
+    if isinstance(trace, str):
+        trace = read_trace(trace)
+    trace = list(trace)
+    costs = _mean_costs(trace)
+    policies = OrderedDict(policies or default_policies)
+    for ttl in ttls:
+        policies['TTL(%ss)' % ttl] = partial(TTL, ttl=ttl)
+    results = []
+    for name, policy in policies.items():
+        for size in sizes:
+            cache = policy(size)
+            access = cache.access
+            hits = 0
+            saved = 0.0
+            for ts, key, _, _ in trace:
+                if access(key, ts):
+                    hits += 1
+                    saved += costs.get(key, 0.0)
+            results.append({
+                'policy': name,
+                'size': size,
+                'hits': hits,
+                'accesses': len(trace),
+                'hit_ratio': hits / len(trace) if trace else 0.0,
+                'saved_time': saved
+            })
+    return results
+
+
+def _mean_costs(trace):
+    """ -> #dict of {key_hash: mean recorded compute time of misses} """
+    totals, counts = defaultdict(float), defaultdict(int)
+    for _, key, hit, cost in trace:
+        if not hit:
+            totals[key] += cost
+            counts[key] += 1
+    return {key: total / counts[key] for key, total in totals.items()}
+
+
+class CacheSimulator(object):
+    """ Replays a recorded cache access trace through LRU, LFU, ARC,
+        W-TinyLFU and TTL policies at many sizes and prints the hit-ratio
+        and saved compute time curves.
+        ..
+            from vital.debug.cachesim import CacheSimulator
+
+            sim = CacheSimulator('/tmp/render.trace', ttls=(60, 600))
+            sim.run()
+            '''
+            ⸨LRU⸩
+            ‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒‒
+                 16 ¦  12.40% ████                           4.05s
+                 32 ¦  25.93% ████████                       8.73s
+                ...
+            '''
+        ..
+    """
+    __slots__ = ('trace', 'sizes', 'policies', 'ttls', 'results')
+
+    def __init__(self, trace, sizes=None, policies=None, ttls=()):
+        """ @trace: #str path of a trace file or an iterable of
+                (timestamp, key_hash, hit, cost) records
+            @sizes: iterable of #int cache sizes, defaults to powers of two
+                up to the number of distinct keys in @trace
+            @policies: #dict of {name: policy class}
+            @ttls: iterable of TTLs in seconds to simulate with :class:TTL
+        """
+        if isinstance(trace, str):
+            trace = read_trace(trace)
+        self.trace = list(trace)
+        if sizes is None:
+            distinct = len(set(key for _, key, _, _ in self.trace))
+            sizes = []
+            size = 16
+            while size < distinct:
+                sizes.append(size)
+                size *= 2
+            sizes.append(max(distinct, 1))
+        self.sizes = sorted(sizes)
+        self.policies = policies
+        self.ttls = ttls
+        self.results = None
+
+    def run(self, _print=True):
+        """ Runs the simulation
+            @_print: #bool whether or not to print the results
+
+            -> #list of result #dict's from :func:simulate
+        """
+        self.results = simulate(
+            self.trace, self.sizes, self.policies, self.ttls)
+        if _print:
+            self.info()
+        return self.results
+
+    @property
+    def observed_hit_ratio(self):
+        """ -> #float hit ratio of the cache the trace was recorded from """
+        if not self.trace:
+            return 0.0
+        return sum(1 for _, _, hit, _ in self.trace if hit) / len(self.trace)
+
+    def info(self, width=30):
+        """ Prints the hit-ratio and saved compute time curve of each policy
+            @width: #int width of the hit-ratio bars in characters
+        """
+        if self.results is None:
+            self.run(_print=False)
+        flag("Observed hit ratio {}".format(bold("{:.2%}".format(
+            self.observed_hit_ratio))), colors.notice_color, padding="top")
+        by_policy = OrderedDict()
+        for result in self.results:
+            by_policy.setdefault(result['policy'], []).append(result)
+        just = len(str(max(self.sizes))) + 2
+        for policy, results in by_policy.items():
+            flag(bold(policy), padding="top")
+            line("‒")
+            for result in results:
+                ratio = result['hit_ratio']
+                print(
+                    (str(result['size']) + " ¦").rjust(just + 2),
+                    "{:.2%}".format(ratio).rjust(7),
+                    colorize(
+                        ("█" * int(round(ratio * width))).ljust(width),
+                        "green"),
+                    Timer.format_time(result['saved_time']))
+        line("‒", padding="bottom")
@@ -7,16 +7,24 @@
 
 """
 import os
+import sys
+import zlib
+import mmap
 import random
 import string
+import time
+import weakref
+import threading
 from math import ceil
+from collections import OrderedDict
 from cmath import log, exp
 
 import hmac
 from Crypto.Cipher import AES
-from hashlib import sha256
+from hashlib import sha256, blake2b
 
-from base64 import b64encode, b64decode
+from base64 import b64encode, b64decode, urlsafe_b64encode, \
+    urlsafe_b64decode
 try:
     import ujson as json
 except ImportError:
@@ -120,6 +128,214 @@ def aes_decrypt(value, secret, block_size=AES.block_size):
         return cipher.decrypt(uniorbytes(value[block_size * 2:], bytes))
 
 
+def _cipher_into(cipher, data, output):
+    """ Encrypts or decrypts the #memoryview @data into the same-sized
+        writable #memoryview @output with the bound @cipher method,
+        avoiding a new #bytes object per call where the backend allows it
+
+        -> @output, or #bytes if the backend can't write into buffers
+    """
+    try:
+        cipher(data, output=output)
+        return output
+    except TypeError:
+        #: PyCrypto doesn't support output buffers
+        return cipher(bytes(data))
+
+
+def _readinto(fileobj, view):
+    """ Fills @view from @fileobj, -> #int number of bytes read """
+    readinto = getattr(fileobj, 'readinto', None)
+    if readinto is not None:
+        n = readinto(view)
+        return n or 0
+    data = fileobj.read(len(view))
+    view[:len(data)] = data
+    return len(data)
+
+
+def _aes_stream(cipher, src, dst, chunk_size):
+    buf = bytearray(chunk_size)
+    out = bytearray(chunk_size)
+    view, out_view = memoryview(buf), memoryview(out)
+    total = 0
+    while True:
+        n = _readinto(src, view)
+        if not n:
+            break
+        dst.write(_cipher_into(cipher, view[:n], out_view[:n]))
+        total += n
+    return total
+
+
+def aes_encrypt_stream(src, dst, secret, block_size=AES.block_size,
+                       chunk_size=64 * 1024):
+    """ AES encrypts the file-like object @src into the file-like object
+        @dst with @secret using the |CFB| mode of AES, reading and writing
+        @chunk_size bytes at a time through reusable buffers, so memory use
+        is flat regardless of the size of @src. The output has the same
+        IV-prefixed format as :func:aes_encrypt and can be decrypted with
+        :func:aes_decrypt or :func:aes_decrypt_stream.
+
+        -> #int number of plaintext bytes encrypted
+
+        ..
+            from vital.security import aes_encrypt_stream
+
+            with open('export.csv', 'rb') as src, \
+                 open('export.csv.aes', 'wb') as dst:
+                aes_encrypt_stream(src, dst, secret)
+        ..
+    """
+    iv = os.urandom(block_size * 2)
+    cipher = AES.new(
+        uniorbytes(secret[:32], bytes), AES.MODE_CFB, iv[:block_size])
+    dst.write(iv)
+    return _aes_stream(cipher.encrypt, src, dst, chunk_size)
+
+
+def aes_decrypt_stream(src, dst, secret, block_size=AES.block_size,
+                       chunk_size=64 * 1024):
+    """ AES decrypts the file-like object @src, encrypted with
+        :func:aes_encrypt or :func:aes_encrypt_stream, into the file-like
+        object @dst with @secret, @chunk_size bytes at a time.
+
+        -> #int number of plaintext bytes decrypted
+
+        ..
+            from vital.security import aes_decrypt_stream
+
+            with open('export.csv.aes', 'rb') as src, \
+                 open('export.csv', 'wb') as dst:
+                aes_decrypt_stream(src, dst, secret)
+        ..
+    """
+    iv = bytearray(block_size * 2)
+    view = memoryview(iv)
+    pos = 0
+    while pos < len(iv):
+        n = _readinto(src, view[pos:])
+        if not n:
+            raise ValueError("Ciphertext is shorter than its IV")
+        pos += n
+    cipher = AES.new(
+        uniorbytes(secret[:32], bytes), AES.MODE_CFB, bytes(iv[:block_size]))
+    return _aes_stream(cipher.decrypt, src, dst, chunk_size)
+
+
+class AESContext(object):
+    """ Holds the prepared key material for @secret so that many values
+        can be encrypted or decrypted without re-deriving it per call.
+        Produces and accepts the same formats as :func:aes_encrypt,
+        :func:aes_decrypt, :func:aes_b64_encrypt and :func:aes_b64_decrypt.
+
+        The bulk methods draw the IVs of every value in a batch from a
+        single entropy read and slice them out of one buffer.
+        ..
+            from vital.security import AESContext
+
+            ctx = AESContext("aLWEFlwgwlreWELFNWEFWLEgwklgbweLKWEBGW")
+            encrypted = ctx.encrypt_many([b'ssn-1', b'ssn-2', b'ssn-3'])
+            ctx.decrypt_many(encrypted)
+            # -> [b'ssn-1', b'ssn-2', b'ssn-3']
+        ..
+        ..
+            from vital.debug import Compare
+
+            values = [os.urandom(64) for _ in range(1000)]
+            Compare(
+                lambda: [aes_encrypt(v, secret) for v in values],
+                lambda: ctx.encrypt_many(values)).time(100)
+        ..
+    """
+    __slots__ = ('key', 'block_size')
+
+    def __init__(self, secret, block_size=AES.block_size):
+        """ @secret: #str or #bytes secret, only the first 32 characters
+                are used
+            @block_size: #int AES block size
+        """
+        self.key = uniorbytes(secret[:32], bytes)
+        self.block_size = block_size
+
+    def encrypt(self, value):
+        """ -> #bytes |CFB| encrypted @value, see :func:aes_encrypt """
+        return self.encrypt_many((value,))[0]
+
+    def decrypt(self, value):
+        """ -> #bytes decrypted @value, see :func:aes_decrypt """
+        if value is not None:
+            return self.decrypt_many((value,))[0]
+
+    def encrypt_many(self, values):
+        """ -> #list of #bytes |CFB| encrypted @values """
+        new, key, mode = AES.new, self.key, AES.MODE_CFB
+        bs = self.block_size
+        ivlen = bs * 2
+        ivs = os.urandom(ivlen * len(values))
+        out = []
+        add = out.append
+        for i, value in enumerate(values):
+            if value.__class__ is not bytes:
+                value = uniorbytes(value, bytes)
+            iv = ivs[i * ivlen:(i + 1) * ivlen]
+            add(iv + new(key, mode, iv[:bs]).encrypt(value))
+        return out
+
+    def decrypt_many(self, values):
+        """ -> #list of #bytes decrypted @values, |None| for |None| values """
+        new, key, mode = AES.new, self.key, AES.MODE_CFB
+        bs = self.block_size
+        ivlen = bs * 2
+        out = []
+        add = out.append
+        for value in values:
+            if value is None:
+                add(None)
+                continue
+            add(new(key, mode, value[:bs]).decrypt(value[ivlen:]))
+        return out
+
+    def b64_encrypt(self, value):
+        """ -> #str |CFB| encrypted @value, see :func:aes_b64_encrypt """
+        return self.b64_encrypt_many((value,))[0]
+
+    def b64_decrypt(self, value):
+        """ -> #str decrypted @value, see :func:aes_b64_decrypt """
+        if value is not None:
+            return self.b64_decrypt_many((value,))[0]
+
+    def b64_encrypt_many(self, values):
+        """ -> #list of #str |CFB| encrypted @values """
+        new, key, mode = AES.new, self.key, AES.MODE_CFB
+        bs = self.block_size
+        ivlen = bs * 2
+        ivs = randstr(ivlen * len(values))
+        out = []
+        add = out.append
+        for i, value in enumerate(values):
+            iv = ivs[i * ivlen:(i + 1) * ivlen]
+            add(iv + b64encode(new(key, mode, iv[:bs].encode()).encrypt(
+                uniorbytes(value, bytes))).decode('utf-8'))
+        return out
+
+    def b64_decrypt_many(self, values):
+        """ -> #list of #str decrypted @values, |None| for |None| values """
+        new, key, mode = AES.new, self.key, AES.MODE_CFB
+        bs = self.block_size
+        ivlen = bs * 2
+        out = []
+        add = out.append
+        for value in values:
+            if value is None:
+                add(None)
+                continue
+            cipher = new(key, mode, uniorbytes(value[:bs], bytes))
+            add(cipher.decrypt(b64decode(
+                uniorbytes(value[ivlen:], bytes))).decode('utf-8'))
+        return out
+
+
 def aes_pad(s, block_size=32, padding='{'):
     """ Adds padding to get the correct block sizes for AES encryption
 
@@ -238,6 +454,402 @@ def cookie_is_encoded(data):
     return data.startswith('!') and '?' in data
 
 
+_MISSING = object()
+
+
+def _json_copy(value):
+    """ -> a copy of the decoded JSON @value, sharing only its immutable
+            scalars
+    """
+    if isinstance(value, dict):
+        return {key: _json_copy(val) for key, val in value.items()}
+    if isinstance(value, list):
+        return [_json_copy(val) for val in value]
+    return value
+
+
+class _VerifiedCache(object):
+    """ Bounded LRU of verified cookie payloads which expire @ttl seconds
+        after they were verified. Keys are a keyed |blake2b| digest of the
+        raw cookie, so the cache never holds the cookies themselves.
+    """
+    __slots__ = ('maxsize', 'ttl', '_data', '_lock', '_key')
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._key = os.urandom(16)
+
+    def key(self, data):
+        return blake2b(data, digest_size=16, key=self._key).digest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        data = self._data
+        with self._lock:
+            data[key] = (value, time.monotonic() + self.ttl)
+            data.move_to_end(key)
+            if len(data) > self.maxsize:
+                data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CookieSigner(object):
+    """ Signs and verifies cookies in the format of :func:cookie with the
+        keyed HMAC state computed once. Each call copies the prepared
+        state instead of re-deriving the key, and signatures are compared
+        with :func:hmac.compare_digest.
+
+        With @cache_size, verified payloads are kept in a bounded LRU for
+        @cache_ttl seconds, so a cookie which arrives again is returned
+        without decoding, authenticating or parsing it. The cache belongs
+        to the signer and therefore to its key: a rotated out signer, or a
+        key retired from a :class:vital.security.keyring.Keyring, takes
+        its cached payloads with it. Each hit returns a fresh copy of the
+        cached payload, so callers may mutate what they are given.
+        ..
+            from vital.security import CookieSigner
+
+            signer = CookieSigner("alBVlwe", "saltyDog")
+            signer.sign("Hello, world.")
+            # -> '!YuOoKwDp8GhrwwojdjTxSCj1c2Z+7yz7r6cC7E3hBWo=?IkhlbGxvLCB3b3JsZC4i'
+            signer.verify(
+                "!YuOoKwDp8GhrwwojdjTxSCj1c2Z+7yz7r6cC7E3hBWo=?IkhlbGxvLCB3b3JsZC4i")
+            # -> 'Hello, world.'
+        ..
+        ..
+            from vital.debug import Compare
+
+            signed = signer.sign({'user_id': 1234})
+            Compare(
+                lambda: cookie(signed, "saltyDog", secret="alBVlwe"),
+                lambda: signer.verify(signed)).time(100000)
+        ..
+    """
+    __slots__ = ('_mac', '_cache')
+
+    def __init__(self, secret, key_salt='', digestmod=None, cache_size=None,
+                 cache_ttl=300):
+        """ @secret: HMAC signing secret key
+            @key_salt: HMAC key signing salt
+            @digestmod: hashing algorithm to sign with, recommended >=sha256
+            @cache_size: #int maximum number of verified payloads to cache,
+                |None| to disable the cache
+            @cache_ttl: #float seconds a verified payload stays cached
+        """
+        key = uniorbytes("{}{}".format(secret, key_salt), bytes)
+        self._mac = hmac.new(key, digestmod=digestmod or sha256)
+        self._cache = _VerifiedCache(cache_size, cache_ttl) \
+            if cache_size else None
+
+    def signature(self, msg):
+        """ -> #bytes base64 encoded signature of the #bytes @msg """
+        mac = self._mac.copy()
+        mac.update(msg)
+        return b64encode(mac.digest())
+
+    def sign(self, data):
+        """ -> #str signed cookie of the json-able @data """
+        msg = b64encode(uniorbytes(json.dumps(data), bytes))
+        return (b'!' + self.signature(msg) + b'?' + msg).decode('ascii')
+
+    def verify(self, data):
+        """ -> the decoded value of the signed cookie @data or |None| if
+                @data is empty, malformed or its signature does not match
+        """
+        if not data:
+            return None
+        data = uniorbytes(data, bytes)
+        cache = self._cache
+        if cache is None:
+            return self._verify(data)
+        key = cache.key(data)
+        value = cache.get(key)
+        if value is _MISSING:
+            value = self._verify(data)
+            if value is not None:
+                cache.set(key, value)
+            else:
+                return None
+        return _json_copy(value)
+
+    def clear_cache(self):
+        """ Empties the verified cookie cache """
+        if self._cache is not None:
+            self._cache.clear()
+
+    def _verify(self, data):
+        sig, sep, msg = data.partition(b'?')
+        if not sep or sig[:1] != b'!':
+            return None
+        if not hmac.compare_digest(sig[1:], self.signature(msg)):
+            return None
+        try:
+            return json.loads(b64decode(msg).decode('utf-8'))
+        except ValueError:
+            return None
+
+    def sign_many(self, values):
+        """ -> #list of signed cookies of each of the json-able @values """
+        sign = self.sign
+        return [sign(value) for value in values]
+
+    def verify_many(self, cookies):
+        """ -> #list of decoded values of each of the signed @cookies, with
+                |None| in place of any which fail verification
+        """
+        verify = self.verify
+        return [verify(data) for data in cookies]
+
+
+def _compact_json(data):
+    try:
+        return json.dumps(data, separators=(',', ':'))
+    except TypeError:
+        #: ujson has no |separators| and is always compact
+        return json.dumps(data)
+
+
+class CompactCookieSigner(CookieSigner):
+    """ Signs and verifies cookies in a compact binary format. Payloads
+        are compact JSON, compressed with :mod:zlib once they reach
+        @compress_threshold bytes if that makes them smaller, and the
+        whole cookie is base64 encoded once with the URL-safe alphabet and
+        no padding.
+        ..
+            binary layout before encoding
+                #uint8              format version, 1
+                #uint8              flags, bit 0 is set if compressed
+                payload             JSON, optionally zlib compressed
+                @tag_size bytes     HMAC of everything above, truncated
+        ..
+        The cookies are not compatible with :func:cookie or
+        :class:CookieSigner.
+        ..
+            from vital.security import CompactCookieSigner
+
+            signer = CompactCookieSigner("alBVlwe", "saltyDog")
+            signed = signer.sign({'user_id': 1234})
+            # -> 'AQB7InVzZXJfaWQiOjEyMzR9...'
+            signer.verify(signed)
+            # -> {'user_id': 1234}
+        ..
+    """
+    __slots__ = ('tag_size', 'compress_threshold', 'compress_level',
+                 'max_size')
+    VERSION = 1
+    COMPRESSED = 1
+
+    def __init__(self, secret, key_salt='', digestmod=None, tag_size=16,
+                 compress_threshold=256, compress_level=1,
+                 max_size=64 * 1024, cache_size=None, cache_ttl=300):
+        """ @secret: HMAC signing secret key
+            @key_salt: HMAC key signing salt
+            @digestmod: hashing algorithm to sign with, recommended >=sha256
+            @tag_size: #int bytes of the HMAC to keep, at least 12
+            @compress_threshold: #int payload size in bytes from which
+                compression is attempted, |None| to never compress
+            @compress_level: #int :mod:zlib compression level
+            @max_size: #int maximum size of a decompressed payload, larger
+                cookies fail verification
+            @cache_size: #int maximum number of verified payloads to cache,
+                see :class:CookieSigner
+            @cache_ttl: #float seconds a verified payload stays cached
+        """
+        super().__init__(secret, key_salt, digestmod, cache_size, cache_ttl)
+        if tag_size < 12 or tag_size > self._mac.digest_size:
+            raise ValueError(
+                "Tag size must be between 12 and %d bytes" %
+                self._mac.digest_size)
+        self.tag_size = tag_size
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self.max_size = max_size
+
+    def _tag(self, msg):
+        mac = self._mac.copy()
+        mac.update(msg)
+        return mac.digest()[:self.tag_size]
+
+    def sign(self, data):
+        """ -> #str signed cookie of the json-able @data """
+        payload = _compact_json(data).encode('utf-8')
+        flags = 0
+        threshold = self.compress_threshold
+        if threshold is not None and len(payload) >= threshold:
+            compressed = zlib.compress(payload, self.compress_level)
+            if len(compressed) < len(payload):
+                payload = compressed
+                flags |= self.COMPRESSED
+        msg = bytes((self.VERSION, flags)) + payload
+        return urlsafe_b64encode(msg + self._tag(msg)).rstrip(b'=').decode(
+            'ascii')
+
+    def _verify(self, data):
+        try:
+            raw = urlsafe_b64decode(data + b'=' * (-len(data) % 4))
+        except ValueError:
+            return None
+        tag_size = self.tag_size
+        if len(raw) < 2 + tag_size or raw[0] != self.VERSION:
+            return None
+        msg, tag = raw[:-tag_size], raw[-tag_size:]
+        if not hmac.compare_digest(self._tag(msg), tag):
+            return None
+        payload = msg[2:]
+        try:
+            if msg[1] & self.COMPRESSED:
+                inflate = zlib.decompressobj()
+                payload = inflate.decompress(payload, self.max_size)
+                if inflate.unconsumed_tail:
+                    return None
+            return json.loads(payload.decode('utf-8'))
+        except (ValueError, zlib.error):
+            return None
+
+
+#
+#  ``Streaming signatures``
+#
+def _update_from_file(mac, fileobj, chunk_size, mmap_threshold):
+    fileno = getattr(fileobj, 'fileno', None)
+    if fileno is not None and mmap_threshold is not None:
+        try:
+            fd = fileno()
+            start = fileobj.tell()
+            size = os.fstat(fd).st_size
+        except (OSError, ValueError, AttributeError):
+            #: io.UnsupportedOperation is an OSError and a ValueError
+            start = size = 0
+        #: Empty files, or files read to their end, cannot be mapped
+        if size - start >= max(mmap_threshold, 1):
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for i in range(start, size, chunk_size):
+                        mac.update(view[i:i + chunk_size])
+                finally:
+                    view.release()
+            fileobj.seek(size)
+            return
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    while True:
+        n = _readinto(fileobj, view)
+        if not n:
+            break
+        mac.update(view[:n])
+
+
+def hmac_stream(source, secret, digestmod=None, chunk_size=64 * 1024,
+                mmap_threshold=1024 * 1024):
+    """ Feeds @source into an HMAC keyed with @secret in bounded chunks
+
+        @source: #bytes, a file-like object which is read from its current
+            position to its end, or an iterable of #bytes chunks
+        @secret: #str or #bytes HMAC key
+        @digestmod: hashing algorithm, defaults to sha256
+        @chunk_size: #int bytes read from file-like objects at a time
+        @mmap_threshold: #int file size from which regular files are
+            memory mapped instead of read, |None| to never map them
+
+        -> :class:hmac.HMAC
+    """
+    mac = hmac.new(uniorbytes(secret, bytes), digestmod=digestmod or sha256)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        mac.update(source)
+    elif hasattr(source, 'read'):
+        _update_from_file(mac, source, chunk_size, mmap_threshold)
+    else:
+        update = mac.update
+        for chunk in source:
+            update(chunk)
+    return mac
+
+
+def _matches(mac, signature):
+    if isinstance(signature, str):
+        return hmac.compare_digest(mac.hexdigest(), signature)
+    return hmac.compare_digest(mac.digest(), signature)
+
+
+def sign_stream(source, secret, digestmod=None, chunk_size=64 * 1024,
+                mmap_threshold=1024 * 1024):
+    """ Signs a file, iterator or #bytes @source with constant memory, see
+        :func:hmac_stream
+
+        -> #str hex HMAC of @source
+        ..
+            from vital.security import sign_stream, verify_stream
+
+            with open('upload.tar', 'rb') as f:
+                signature = sign_stream(f, secret)
+            with open('upload.tar', 'rb') as f:
+                verify_stream(f, signature, secret)
+            # -> True
+        ..
+    """
+    return hmac_stream(
+        source, secret, digestmod, chunk_size, mmap_threshold).hexdigest()
+
+
+def verify_stream(source, signature, secret, digestmod=None,
+                  chunk_size=64 * 1024, mmap_threshold=1024 * 1024):
+    """ -> #bool |True| if @signature, a #str hex or #bytes raw HMAC, is
+            the HMAC of @source, see :func:hmac_stream
+    """
+    return _matches(hmac_stream(
+        source, secret, digestmod, chunk_size, mmap_threshold), signature)
+
+
+async def ahmac_stream(source, secret, digestmod=None):
+    """ -> :class:hmac.HMAC of the #bytes chunks of the async iterable
+            @source, e.g. an |aiohttp| request body's |iter_chunked()|
+    """
+    mac = hmac.new(uniorbytes(secret, bytes), digestmod=digestmod or sha256)
+    update = mac.update
+    async for chunk in source:
+        update(chunk)
+    return mac
+
+
+async def async_sign_stream(source, secret, digestmod=None):
+    """ -> #str hex HMAC of the async iterable @source """
+    return (await ahmac_stream(source, secret, digestmod)).hexdigest()
+
+
+async def async_verify_stream(source, signature, secret, digestmod=None):
+    """ -> #bool |True| if @signature, a #str hex or #bytes raw HMAC, is
+            the HMAC of the async iterable @source
+        ..
+            async def webhook(request):
+                signature = request.headers['X-Signature']
+                ok = await async_verify_stream(
+                    request.content.iter_chunked(65536), signature, secret)
+        ..
+    """
+    return _matches(await ahmac_stream(source, secret, digestmod), signature)
+
+
 def strkey(val, chaffify=1, keyspace=string.ascii_letters + string.digits):
     """ Converts integers to a sequence of strings, and reverse.
         This is not intended to obfuscate numbers in any kind of
@@ -270,6 +882,7 @@ def strkey(val, chaffify=1, keyspace=string.ascii_letters + string.digits):
     """
     chaffify = chaffify or 1
     keylen = len(keyspace)
+    codec = _strkey_codec(keyspace)
     try:
         # INT TO STRING
         if val < 0:
@@ -278,13 +891,16 @@ def strkey(val, chaffify=1, keyspace=string.ascii_letters + string.digits):
         # chaffify the value
         val = val * chaffify
 
+        if codec is not None:
+            return codec._digits(val)
+
         if val == 0:
             return keyspace[0]
 
         # output the new string value
         out = []
         out_add = out.append
-        
+
         while val > 0:
             val, digit = divmod(val, keylen)
             out_add(keyspace[digit])
@@ -294,27 +910,424 @@ def strkey(val, chaffify=1, keyspace=string.ascii_letters + string.digits):
         # STRING TO INT
         out = 0
         val = str(val)
-        find = str.find
-        for c in val:
-            out = out * keylen + find(keyspace, c)
+        #: Characters outside of the keyspace count as -1, unlike
+        #  :meth:StrKeyCodec.decode which rejects them
+        if codec is not None:
+            lookup = codec._lookup.get
+            for c in val:
+                out = out * keylen + lookup(c, -1)
+        else:
+            find = str.find
+            for c in val:
+                out = out * keylen + find(keyspace, c)
         # dechaffify the value
         out = out // chaffify
         return int(out)
 
 
+_strkey_codecs = {}
+
+
+def _strkey_codec(keyspace):
+    """ -> the cached :class:StrKeyCodec of @keyspace, or |None| if
+            @keyspace is not a valid codec keyspace or the cache is full
+    """
+    codec = _strkey_codecs.get(keyspace, _MISSING)
+    if codec is _MISSING:
+        if len(_strkey_codecs) >= 64:
+            return None
+        try:
+            codec = StrKeyCodec(keyspace)
+        except ValueError:
+            codec = None
+        _strkey_codecs[keyspace] = codec
+    return codec
+
+
+def _is_ndarray(value):
+    """ -> #bool |True| if @value is a :class:numpy.ndarray, without
+            importing numpy when nothing else has
+    """
+    np = sys.modules.get('numpy')
+    return np is not None and isinstance(value, np.ndarray)
+
+
+class StrKeyCodec(object):
+    """ The integer <-> string encoding of :func:strkey compiled for one
+        @keyspace. Encoding emits two characters per |divmod| from a
+        precomputed table of character pairs, and decoding maps characters
+        to digits with a reverse lookup table rather than searching the
+        keyspace for each one.
+
+        With @width every key is left-padded with the first character of
+        the keyspace to exactly @width characters, and values which need
+        more characters raise :class:ValueError. Padding does not change
+        the decoded value.
+
+        :meth:encode_many and :meth:decode_many accept lists, or
+        :class:numpy.ndarray when numpy is installed, which are encoded and
+        decoded column-wise in numpy.
+        ..
+            from vital.security import StrKeyCodec
+
+            codec = StrKeyCodec(chaffify=1, width=8)
+            codec.encode(2000000)
+            # -> 'aaaaiyse'
+            codec.decode('aaaaiyse')
+            # -> 2000000
+            codec.encode_many([1, 2, 3])
+            # -> ['aaaaaaab', 'aaaaaaac', 'aaaaaaad']
+        ..
+        ..
+            from vital.debug import Compare
+
+            ids = list(range(10 ** 12, 10 ** 12 + 10000))
+            Compare(
+                lambda: [strkey(i) for i in ids],
+                lambda: codec.encode_many(ids)).time(100)
+        ..
+    """
+    __slots__ = (
+        'keyspace', 'chaffify', 'width', 'base', '_lookup', '_pairs',
+        '_np_keyspace', '_np_lookup')
+
+    def __init__(self, keyspace=string.ascii_letters + string.digits,
+                 chaffify=1, width=None):
+        """ @keyspace: #str of unique output chars
+            @chaffify: #int multiple to avoid 0=a, 1=b, 2=c, ... obfuscates
+                the ordering
+            @width: #int fixed number of characters in every key
+        """
+        if len(keyspace) < 2:
+            raise ValueError("Keyspace size must be >1")
+        if len(set(keyspace)) != len(keyspace):
+            raise ValueError("Keyspace characters must be unique")
+        self.keyspace = keyspace
+        self.chaffify = chaffify or 1
+        self.width = width
+        self.base = len(keyspace)
+        self._lookup = {char: i for i, char in enumerate(keyspace)}
+        self._pairs = [a + b for a in keyspace for b in keyspace]
+        self._np_keyspace = None
+        self._np_lookup = None
+
+    def _digits(self, val):
+        base = self.base
+        if val < base:
+            return self.keyspace[val]
+        base2 = base * base
+        pairs = self._pairs
+        out = []
+        add = out.append
+        while val >= base2:
+            val, digit = divmod(val, base2)
+            add(pairs[digit])
+        add(pairs[val] if val >= base else self.keyspace[val])
+        out.reverse()
+        return "".join(out)
+
+    def _pad(self, key):
+        width = self.width
+        if len(key) > width:
+            raise ValueError(
+                "%r is longer than the fixed width of %d" % (key, width))
+        return key.rjust(width, self.keyspace[0])
+
+    def encode(self, val):
+        """ -> #str key of the #int @val """
+        if val < 0:
+            raise ValueError("Input value must be greater than -1.")
+        key = self._digits(val * self.chaffify)
+        if self.width is not None:
+            key = self._pad(key)
+        return key
+
+    def decode(self, key):
+        """ -> #int value of the #str @key
+            !ValueError if @key contains characters outside of the keyspace
+        """
+        try:
+            digits = list(map(self._lookup.__getitem__, key))
+        except KeyError as e:
+            raise ValueError("%r is not in the keyspace" % e.args[0])
+        base = self.base
+        out = 0
+        for digit in digits:
+            out = out * base + digit
+        return out // self.chaffify
+
+    def encode_many(self, values):
+        """ -> #list of #str keys of the #int @values, or a
+                :class:numpy.ndarray of #str if @values is a
+                :class:numpy.ndarray of integers
+        """
+        if _is_ndarray(values):
+            return self._np_encode(values)
+        encode = self.encode
+        return [encode(val) for val in values]
+
+    def decode_many(self, keys):
+        """ -> #list of #int values of the #str @keys, or a
+                :class:numpy.ndarray of |int64| if @keys is a
+                :class:numpy.ndarray of #str
+            !ValueError if any key contains characters outside of the
+                keyspace
+        """
+        if _is_ndarray(keys):
+            return self._np_decode(keys)
+        decode = self.decode
+        return [decode(key) for key in keys]
+
+    def _np_encode(self, values):
+        import numpy as np
+        if not values.size:
+            return np.array([], dtype='<U1')
+        if values.dtype.kind not in 'iu':
+            return np.array(self.encode_many(values.tolist()))
+        if int(values.min()) < 0:
+            raise ValueError("Input value must be greater than -1.")
+        largest = int(values.max()) * self.chaffify
+        if largest >= 2 ** 63:
+            return np.array(self.encode_many(values.tolist()))
+        width = len(self._digits(largest))
+        if self.width is not None:
+            if width > self.width:
+                raise ValueError(
+                    "%d is longer than the fixed width of %d" %
+                    (largest, self.width))
+            width = self.width
+        if self._np_keyspace is None:
+            self._np_keyspace = np.array(list(self.keyspace))
+        vals = values.astype(np.int64).ravel() * self.chaffify
+        digits = np.empty((vals.size, width), dtype=np.int64)
+        for col in range(width - 1, -1, -1):
+            vals, digits[:, col] = np.divmod(vals, self.base)
+        keys = np.ascontiguousarray(self._np_keyspace[digits]).view(
+            '<U%d' % width).reshape(values.shape)
+        if self.width is None:
+            keys = np.char.lstrip(keys, self.keyspace[0])
+            keys[keys == ''] = self.keyspace[0]
+        return keys
+
+    def _np_decode(self, keys):
+        import numpy as np
+        if keys.dtype.kind != 'U':
+            return np.array(self.decode_many(keys.tolist()))
+        if not keys.size:
+            return np.array([], dtype=np.int64)
+        width = keys.dtype.itemsize // 4
+        if self.base ** width >= 2 ** 63:
+            return np.array(self.decode_many(keys.tolist()))
+        if self._np_lookup is None:
+            lookup = np.full(
+                max(map(ord, self.keyspace)) + 1, -1, dtype=np.int64)
+            lookup[[ord(char) for char in self.keyspace]] = np.arange(
+                self.base)
+            self._np_lookup = lookup
+        lookup = self._np_lookup
+        codes = np.ascontiguousarray(keys).ravel().view(np.uint32).reshape(
+            -1, width)
+        lengths = np.char.str_len(keys).ravel()
+        out = np.zeros(codes.shape[0], dtype=np.int64)
+        for col in range(width):
+            present = col < lengths
+            column = codes[:, col]
+            digits = np.where(
+                column < len(lookup),
+                lookup[np.minimum(column, len(lookup) - 1)], -1)
+            if (digits[present] < 0).any():
+                raise ValueError("Keys contain characters outside of the "
+                                 "keyspace")
+            out = np.where(present, out * self.base + digits, out)
+        return (out // self.chaffify).reshape(keys.shape)
+
+
 #
 # ``Random token generation``
 #
+class EntropyPool(random.Random):
+    """ A cryptographically secure random number generator which reads
+        :func:os.urandom in blocks of @block_size bytes and hands them out
+        from a buffer, so generating a token costs a slice of the buffer
+        rather than a system call per character. Like
+        :class:random.SystemRandom it has no state to seed and supports
+        every method of :class:random.Random.
+
+        Characters are mapped from the buffered bytes with rejection
+        sampling, bytes which would bias the result towards the start of
+        the keyspace are discarded. The pool is thread-safe and discards
+        its buffer in a forked child, so parent and child never share
+        random bytes.
+        ..
+            from vital.security import EntropyPool
+
+            pool = EntropyPool()
+            pool.randstr(32)
+            # -> 'Vq3Wm0fPZ8nRkXzGq2bYtE6sLh1cAa9d'
+            pool.randstr_many(3, 8)
+            # -> ['K1oQz3Lm', 'c8WbT0pA', 'uY7eRr2N']
+        ..
+    """
+
+    def __init__(self, block_size=64 * 1024):
+        """ @block_size: #int number of bytes read from :func:os.urandom
+                per refill
+        """
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._buffer = b''
+        self._pos = 0
+        self._pid = os.getpid()
+        self._tables = {}
+        super().__init__()
+        _pools.add(self)
+
+    def seed(self, *args, **kwargs):
+        """ Stub method, the pool is seeded by :func:os.urandom """
+        return None
+
+    def _notimplemented(self, *args, **kwargs):
+        raise NotImplementedError('Entropy pools have no state')
+
+    getstate = setstate = _notimplemented
+
+    def reseed(self):
+        """ Discards the buffered bytes """
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self._buffer = b''
+        self._pos = 0
+        self._pid = os.getpid()
+
+    def randbytes(self, n):
+        """ -> #bytes @n random bytes """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            pos = self._pos
+            end = pos + n
+            if end > len(self._buffer):
+                if n >= self.block_size:
+                    return os.urandom(n)
+                self._buffer = os.urandom(self.block_size)
+                pos, end = 0, n
+            self._pos = end
+            return self._buffer[pos:end]
+
+    def random(self):
+        """ -> #float in the interval [0.0, 1.0) """
+        return (int.from_bytes(self.randbytes(7), 'big') >> 3) * 2 ** -53
+
+    def getrandbits(self, k):
+        """ -> #int with @k random bits """
+        if k < 0:
+            raise ValueError('Number of bits must be non-negative')
+        numbytes = (k + 7) // 8
+        x = int.from_bytes(self.randbytes(numbytes), 'big')
+        return x >> (numbytes * 8 - k)
+
+    def _table(self, keyspace):
+        try:
+            return self._tables[keyspace]
+        except KeyError:
+            pass
+        size = len(keyspace)
+        if size < 2:
+            raise ValueError("Keyspace size must be >1")
+        if size > 256 or max(map(ord, keyspace)) > 255:
+            table = None
+        else:
+            #: Bytes >= |limit| are deleted so that every character of the
+            #  keyspace is mapped from the same number of byte values
+            limit = 256 - 256 % size
+            table = (
+                bytes(ord(keyspace[b % size]) for b in range(256)),
+                bytes(range(limit, 256)),
+                limit / 256)
+        if len(self._tables) < 64:
+            self._tables[keyspace] = table
+        return table
+
+    def _chars(self, n, keyspace):
+        table = self._table(keyspace) if isinstance(keyspace, str) else None
+        if table is None:
+            choice = self.choice
+            return ''.join(choice(keyspace) for _ in range(n))
+        translation, delete, ratio = table
+        randbytes = self.randbytes
+        chars = b''
+        while len(chars) < n:
+            need = n - len(chars)
+            chars += randbytes(int(need / ratio) + 8).translate(
+                translation, delete)
+        return chars[:n].decode('latin-1')
+
+    def randstr(self, size, keyspace=string.ascii_letters + string.digits):
+        """ -> #str of @size random characters from @keyspace """
+        return self._chars(int(ceil(size)), keyspace)
+
+    def randstr_many(self, n, size,
+                     keyspace=string.ascii_letters + string.digits):
+        """ -> #list of @n #str of @size random characters from @keyspace
+                generated from one pass over the pool
+        """
+        size = int(ceil(size))
+        chars = self._chars(n * size, keyspace)
+        return [chars[i:i + size] for i in range(0, n * size, size)]
+
+
+_pools = weakref.WeakSet()
+
+
+def _after_fork():
+    for pool in list(_pools):
+        #: The lock may have been held by a thread which does not exist in
+        #  the child
+        pool._lock = threading.Lock()
+        pool._reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+entropy_pool = EntropyPool()
+
+
+def randstr_many(n, size, keyspace=string.ascii_letters + string.digits,
+                 rng=None):
+    """ Returns @n cryptographically secure random strings of @size
+        characters within @keyspace
+
+        @n: (#int) number of strings to generate
+        @size: (#int) number of random characters in each string
+        @keyspace: (#str) or iterable allowed output chars
+        @rng: the :class:EntropyPool to use, defaults to the shared
+            :data:entropy_pool
+
+        -> #list of #str random keys
+
+        ..
+            from vital.security import randstr_many
+
+            session_ids = randstr_many(100000, 32)
+        ..
+    """
+    return (rng or entropy_pool).randstr_many(n, size, keyspace)
+
+
 def randhex(size=32, rng=None):
     """ Gets a random hex string of @size in terms of number of characters.
         This is an extremely fast way to generate a random string.
 
         @size: (#int) approximate size of the hex to generate in number
             of characters
-        @rng: the random number generator to use, :class:random.SystemRandom
-            is used by default.
+        @rng: the random number generator to use, the shared
+            :class:EntropyPool is used by default.
     """
-    return "%0x" % (rng or random.SystemRandom()).getrandbits(size * 4)
+    return "%0x" % (rng or entropy_pool).getrandbits(size * 4)
 
 
 def calc_chars_in(bits, keyspace):
@@ -382,7 +1395,7 @@ def iter_random_chars(bits,
                       keyspace=string.ascii_letters + string.digits + '#/.',
                       rng=None):
     """ Yields a cryptographically secure random key of desired @bits of
-        entropy within @keyspace using :class:random.SystemRandom
+        entropy within @keyspace using the shared :class:EntropyPool
 
         @bits: (#int) minimum bits of entropy
         @keyspace: (#str) or iterable allowed output chars
@@ -397,7 +1410,9 @@ def iter_random_chars(bits,
         raise ValueError('Bits cannot be <8')
     else:
         chars = chars_in(bits, keyspace)
-    rng = rng or random.SystemRandom()
+    if rng is None:
+        yield from entropy_pool.randstr(chars, keyspace)
+        return
     for char in range(int(ceil(chars))):
         yield rng.choice(keyspace)
 
@@ -405,12 +1420,12 @@ def iter_random_chars(bits,
 def randkey(bits, keyspace=string.ascii_letters + string.digits + '#/.',
             rng=None):
     """ Returns a cryptographically secure random key of desired @bits of
-        entropy within @keyspace using :class:random.SystemRandom
+        entropy within @keyspace using the shared :class:EntropyPool
 
         @bits: (#int) minimum bits of entropy
         @keyspace: (#str) or iterable allowed output chars
-        @rng: the random number generator to use. Defaults to
-            :class:random.SystemRandom. Must have a |choice| method
+        @rng: the random number generator to use. Defaults to the shared
+            :class:EntropyPool. Must have a |choice| method
 
         -> (#str) random key
 
@@ -427,17 +1442,22 @@ def randkey(bits, keyspace=string.ascii_letters + string.digits + '#/.',
             # -> 'aabcccbabcaacaccccabcaabbabcacabacbbbaaab'
         ..
     """
+    if rng is None:
+        if bits < 8:
+            raise ValueError('Bits cannot be <8')
+        return entropy_pool.randstr(chars_in(bits, keyspace), keyspace)
     return "".join(char for char in iter_random_chars(bits, keyspace, rng))
 
 
 def randstr(size, keyspace=string.ascii_letters + string.digits, rng=None):
     """ Returns a cryptographically secure random string of desired @size
-        (in character length) within @keyspace using :class:random.SystemRandom
+        (in character length) within @keyspace using the shared
+        :class:EntropyPool
 
         @size: (#int) number of random characters to generate
         @keyspace: (#str) or iterable allowed output chars
-        @rng: the random number generator to use. Defaults to
-            :class:random.SystemRandom. Must have a |choice| method
+        @rng: the random number generator to use. Defaults to the shared
+            :class:EntropyPool. Must have a |choice| method
 
         -> #str random key
 
@@ -448,5 +1468,6 @@ def randstr(size, keyspace=string.ascii_letters + string.digits, rng=None):
             # -> '9qaX'
         ..
     """
-    rng = rng or random.SystemRandom()
+    if rng is None:
+        return entropy_pool.randstr(size, keyspace)
     return "".join(rng.choice(keyspace) for char in range(int(ceil(size))))
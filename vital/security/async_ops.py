@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+
+   `Vital Security asyncio offloading`
+    Coroutine counterparts of the CPU-bound functions in
+    :mod:vital.security which run off of the event loop
+--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--
+    The MIT License (MIT) (c) 2016 Jared Lunde
+
+    Inputs are dispatched by size
+    ..
+        < INLINE_THRESHOLD      run inline on the event loop, an executor
+                                round trip costs more than the work
+        < BATCH_THRESHOLD       queued and submitted to the executor
+                                together with every other small call made
+                                in the same loop iteration, up to
+                                MAX_BATCH calls per submission
+        otherwise               submitted to the executor on their own
+    ..
+    The size of inputs other than #bytes or #str, like the @data of
+    :func:cookie, is estimated from their JSON encoding. Key derivation is
+    always submitted on its own.
+
+"""
+import os
+import asyncio
+import hashlib
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+import vital.security as _security
+
+
+__all__ = (
+  'aes_encrypt',
+  'aes_decrypt',
+  'aes_b64_encrypt',
+  'aes_b64_decrypt',
+  'cookie',
+  'pbkdf2_hmac',
+  'scrypt',
+  'run',
+  'get_executor',
+  'set_executor'
+)
+
+
+INLINE_THRESHOLD = 1024
+BATCH_THRESHOLD = 64 * 1024
+MAX_BATCH = 64
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """ -> the shared :class:concurrent.futures.Executor, by default a
+            :class:ThreadPoolExecutor with one thread per CPU. The cipher
+            and hash backends release the GIL, so threads run them in
+            parallel.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=os.cpu_count() or 1,
+                    thread_name_prefix='vital.security')
+    return _executor
+
+
+def set_executor(executor):
+    """ Replaces the shared executor with @executor, e.g. a
+        :class:concurrent.futures.ProcessPoolExecutor. The previous
+        executor is not shut down.
+
+        -> the previous executor or |None|
+    """
+    global _executor
+    with _executor_lock:
+        previous, _executor = _executor, executor
+    return previous
+
+
+def _run_batch(calls):
+    out = []
+    add = out.append
+    for func, args in calls:
+        try:
+            add((True, func(*args)))
+        except Exception as e:
+            add((False, e))
+    return out
+
+
+class _Batcher(object):
+    """ Collects the small calls made in one iteration of each event loop
+        and submits them to the executor as a single job
+    """
+
+    def __init__(self):
+        self._pending = {}
+
+    def submit(self, loop, func, args):
+        future = loop.create_future()
+        pending = self._pending.get(loop)
+        if pending is None:
+            pending = self._pending[loop] = []
+            loop.call_soon(self._flush, loop)
+        pending.append((func, args, future))
+        if len(pending) >= MAX_BATCH:
+            self._flush(loop)
+        return future
+
+    def _flush(self, loop):
+        batch = self._pending.pop(loop, None)
+        if not batch:
+            return
+        futures = [future for _, _, future in batch]
+        try:
+            job = loop.run_in_executor(
+                get_executor(), _run_batch,
+                [(func, args) for func, args, _ in batch])
+        except Exception as e:
+            #: e.g. the executor was shut down, every caller waiting on
+            #  the batch gets the error rather than hanging
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        job.add_done_callback(partial(self._resolve, futures))
+
+    @staticmethod
+    def _resolve(futures, job):
+        if job.cancelled():
+            for future in futures:
+                future.cancel()
+            return
+        if job.exception() is not None:
+            error = job.exception()
+            for future in futures:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for future, (ok, result) in zip(futures, job.result()):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(result)
+            else:
+                future.set_exception(result)
+
+
+_batcher = _Batcher()
+
+
+def _size(value):
+    """ -> #int size of the buffer or #str @value, or a rough estimate of
+            the size of any other @value encoded as JSON. The estimate
+            stops counting once it exceeds :data:BATCH_THRESHOLD.
+    """
+    if isinstance(value, (bytes, bytearray, str, memoryview)):
+        return len(value)
+    size = 0
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, (bytes, bytearray, str, memoryview)):
+            size += len(value) + 3
+        elif isinstance(value, dict):
+            size += 2 + 2 * len(value)
+            if size > BATCH_THRESHOLD:
+                break
+            stack.extend(value.keys())
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            size += 2 + len(value)
+            if size > BATCH_THRESHOLD:
+                break
+            stack.extend(value)
+        else:
+            size += 8
+        if size > BATCH_THRESHOLD:
+            break
+    return size
+
+
+async def run(func, *args, size=None):
+    """ Runs |func(*args)| inline, batched or on its own in the shared
+        executor depending on @size, see the module documentation
+
+        @func: picklable callable if the shared executor is a process pool
+        @size: #int size of the input in bytes, |None| to always batch
+
+        -> the result of @func
+    """
+    if size is not None and size < INLINE_THRESHOLD:
+        return func(*args)
+    loop = asyncio.get_running_loop()
+    if size is None or size < BATCH_THRESHOLD:
+        return await _batcher.submit(loop, func, args)
+    return await loop.run_in_executor(get_executor(), partial(func, *args))
+
+
+async def aes_encrypt(value, secret, block_size=_security.AES.block_size):
+    """ -> #bytes :func:vital.security.aes_encrypt of @value """
+    return await run(_security.aes_encrypt, value, secret, block_size,
+                     size=_size(value))
+
+
+async def aes_decrypt(value, secret, block_size=_security.AES.block_size):
+    """ -> #bytes :func:vital.security.aes_decrypt of @value """
+    return await run(_security.aes_decrypt, value, secret, block_size,
+                     size=_size(value))
+
+
+async def aes_b64_encrypt(value, secret,
+                          block_size=_security.AES.block_size):
+    """ -> #str :func:vital.security.aes_b64_encrypt of @value """
+    return await run(_security.aes_b64_encrypt, value, secret, block_size,
+                     size=_size(value))
+
+
+async def aes_b64_decrypt(value, secret,
+                          block_size=_security.AES.block_size):
+    """ -> #str :func:vital.security.aes_b64_decrypt of @value """
+    return await run(_security.aes_b64_decrypt, value, secret, block_size,
+                     size=_size(value))
+
+
+async def cookie(data, key_salt='', secret=None, digestmod=None):
+    """ -> :func:vital.security.cookie of @data """
+    return await run(_security.cookie, data, key_salt, secret, digestmod,
+                     size=_size(data))
+
+
+async def pbkdf2_hmac(hash_name, password, salt, iterations, dklen=None):
+    """ -> #bytes :func:hashlib.pbkdf2_hmac derived key, always computed in
+            the shared executor
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(), partial(
+            hashlib.pbkdf2_hmac, hash_name, password, salt, iterations,
+            dklen))
+
+
+async def scrypt(password, salt, n, r, p, maxmem=0, dklen=64):
+    """ -> #bytes :func:hashlib.scrypt derived key, always computed in the
+            shared executor
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(), partial(
+            hashlib.scrypt, password, salt=salt, n=n, r=r, p=p,
+            maxmem=maxmem, dklen=dklen))
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+
+   `Vital Security keyring`
+    Signs cookies and encrypts values with the active key of a keyring and
+    tags them with its key ID, so that values produced with older keys are
+    verified or decrypted with the right key without trying each of them
+--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--
+    The MIT License (MIT) (c) 2016 Jared Lunde
+
+"""
+import threading
+
+from Crypto.Cipher import AES
+
+from vital.security import CookieSigner, AESContext
+from vital.tools.encoding import uniorbytes
+
+
+__all__ = ('Keyring',)
+
+
+class _Key(object):
+    __slots__ = ('kid', 'prefix', 'bprefix', 'signer', 'context')
+
+    def __init__(self, kid, secret, key_salt, digestmod, block_size,
+                 cache_size, cache_ttl):
+        self.kid = kid
+        self.prefix = kid + ':'
+        self.bprefix = self.prefix.encode('ascii')
+        self.signer = CookieSigner(
+            secret, key_salt, digestmod, cache_size, cache_ttl)
+        self.context = AESContext(secret, block_size)
+
+
+class Keyring(object):
+    """ A set of secrets identified by short key IDs. Cookies signed and
+        values encrypted by the keyring are prefixed with |<kid>:|, so
+        verifying or decrypting them is one dict lookup for the prepared
+        :class:vital.security.CookieSigner or
+        :class:vital.security.AESContext of that key no matter how many
+        keys are in rotation.
+
+        New values are always produced with the active key. Retired keys
+        are forgotten, and values produced with them no longer verify or
+        decrypt.
+        ..
+            from vital.security.keyring import Keyring
+
+            keyring = Keyring({'k1': 'alBVlwe'}, active='k1')
+            signed = keyring.sign({'user_id': 1234})
+            # -> 'k1:!...?...'
+
+            # Rotate: sign with k2, still accept k1 until it is retired
+            keyring.add('k2', 'wLEgwklgbweLK', activate=True)
+            keyring.verify(signed)
+            # -> {'user_id': 1234}
+            keyring.retire('k1')
+            keyring.verify(signed)
+            # -> None
+        ..
+    """
+
+    def __init__(self, keys=None, active=None, key_salt='', digestmod=None,
+                 block_size=AES.block_size, cache_size=None, cache_ttl=300):
+        """ @keys: #dict of {#str key ID: secret}
+            @active: #str ID of the key to sign and encrypt with, defaults
+                to the last of @keys
+            @key_salt: HMAC key signing salt
+            @digestmod: hashing algorithm to sign with, recommended >=sha256
+            @block_size: #int AES block size
+            @cache_size: #int maximum number of verified cookies to cache
+                per key, see :class:vital.security.CookieSigner. Retiring
+                a key drops its cache.
+            @cache_ttl: #float seconds a verified cookie stays cached
+        """
+        self.key_salt = key_salt
+        self.digestmod = digestmod
+        self.block_size = block_size
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._active = None
+        for kid, secret in (keys or {}).items():
+            self.add(kid, secret)
+        if active is not None:
+            self.activate(active)
+
+    def __contains__(self, kid):
+        return kid in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def active(self):
+        """ -> #str ID of the active key """
+        if self._active is None:
+            raise ValueError("The keyring has no active key")
+        return self._active.kid
+
+    @property
+    def kids(self):
+        """ -> #list of the #str IDs of every key """
+        return list(self._keys)
+
+    def add(self, kid, secret, activate=False):
+        """ Adds @secret to the keyring under @kid
+
+            @kid: #str short key ID, must not contain |:|
+            @secret: #str or #bytes secret
+            @activate: #bool whether or not to sign and encrypt new values
+                with this key, the first key added is always activated
+        """
+        if not kid or not isinstance(kid, str) or ':' in kid:
+            raise ValueError("Key IDs must be non-empty #str without ':'")
+        key = _Key(kid, secret, self.key_salt, self.digestmod,
+                   self.block_size, self.cache_size, self.cache_ttl)
+        with self._lock:
+            if kid in self._keys:
+                raise ValueError("Key ID %r is already in the keyring" % kid)
+            #: Readers never lock, so the table is replaced instead of
+            #  mutated
+            keys = dict(self._keys)
+            keys[kid] = key
+            self._keys = keys
+            if activate or self._active is None:
+                self._active = key
+
+    def activate(self, kid):
+        """ Signs and encrypts new values with the key @kid """
+        try:
+            self._active = self._keys[kid]
+        except KeyError:
+            raise ValueError("Key ID %r is not in the keyring" % kid)
+
+    def retire(self, kid):
+        """ Removes the key @kid, values produced with it no longer verify
+            or decrypt
+        """
+        with self._lock:
+            if kid not in self._keys:
+                raise ValueError("Key ID %r is not in the keyring" % kid)
+            if self._active is not None and self._active.kid == kid:
+                raise ValueError(
+                    "The active key %r cannot be retired" % kid)
+            keys = dict(self._keys)
+            del keys[kid]
+            self._keys = keys
+
+    def _active_key(self):
+        key = self._active
+        if key is None:
+            raise ValueError("The keyring has no active key")
+        return key
+
+    def _key_of(self, value):
+        kid, found, rest = value.partition(b':')
+        if not found:
+            return None, None
+        return self._keys.get(kid.decode('ascii', 'replace')), rest
+
+    #
+    #  ``Cookies``
+    #
+    def sign(self, data):
+        """ -> #str cookie of the json-able @data signed with the active
+                key and prefixed with its ID
+        """
+        key = self._active_key()
+        return key.prefix + key.signer.sign(data)
+
+    def verify(self, data):
+        """ -> the decoded value of the signed cookie @data or |None| if it
+                is malformed, signed with an unknown or retired key or its
+                signature does not match
+        """
+        if not data:
+            return None
+        #: Partitioned as #bytes, cookies need not be valid UTF-8
+        key, rest = self._key_of(uniorbytes(data, bytes))
+        if key is None:
+            return None
+        return key.signer.verify(rest)
+
+    def sign_many(self, values):
+        """ -> #list of signed cookies of each of the json-able @values """
+        key = self._active_key()
+        prefix, sign = key.prefix, key.signer.sign
+        return [prefix + sign(value) for value in values]
+
+    def verify_many(self, cookies):
+        """ -> #list of decoded values of each of the signed @cookies, with
+                |None| in place of any which fail verification
+        """
+        verify = self.verify
+        return [verify(data) for data in cookies]
+
+    #
+    #  ``Encryption``
+    #
+    def encrypt(self, value):
+        """ -> #bytes @value encrypted with the active key and prefixed with
+                its ID, see :func:vital.security.aes_encrypt
+        """
+        key = self._active_key()
+        return key.bprefix + key.context.encrypt(value)
+
+    def decrypt(self, value):
+        """ -> #bytes decrypted @value
+            !ValueError if @value was encrypted with an unknown or retired
+                key
+        """
+        if value is None:
+            return None
+        key, rest = self._key_of(uniorbytes(value, bytes))
+        if key is None:
+            raise ValueError("Value was not encrypted with a known key")
+        return key.context.decrypt(rest)
+
+    def encrypt_many(self, values):
+        """ -> #list of each of @values encrypted with the active key """
+        key = self._active_key()
+        prefix = key.bprefix
+        return [prefix + value for value in key.context.encrypt_many(values)]
+
+    def decrypt_many(self, values):
+        """ -> #list of each of the encrypted @values decrypted """
+        decrypt = self.decrypt
+        return [decrypt(value) for value in values]
+
+    def b64_encrypt(self, value):
+        """ -> #str @value encrypted with the active key and prefixed with
+                its ID, see :func:vital.security.aes_b64_encrypt
+        """
+        key = self._active_key()
+        return key.prefix + key.context.b64_encrypt(value)
+
+    def b64_decrypt(self, value):
+        """ -> #str decrypted @value
+            !ValueError if @value was encrypted with an unknown or retired
+                key
+        """
+        if value is None:
+            return None
+        key, rest = self._key_of(uniorbytes(value, bytes))
+        if key is None:
+            raise ValueError("Value was not encrypted with a known key")
+        return key.context.b64_decrypt(rest)
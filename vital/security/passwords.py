@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+
+   `Vital Security password hashing`
+    Password hashes built on the key derivation functions of :mod:hashlib
+    with their parameters encoded in the hash string
+--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--
+    The MIT License (MIT) (c) 2016 Jared Lunde
+
+    Hash formats, salts and digests are unpadded base64
+    ..
+        $scrypt$ln=<log2 n>,r=<r>,p=<p>$<salt>$<digest>
+        $pbkdf2-<hash name>$i=<iterations>$<salt>$<digest>
+    ..
+
+"""
+import os
+import hmac
+import time
+import asyncio
+import hashlib
+import binascii
+import threading
+from base64 import b64encode, b64decode
+from concurrent.futures import ProcessPoolExecutor
+
+from vital.tools.encoding import uniorbytes
+
+
+__all__ = (
+  'hash_password',
+  'verify_password',
+  'needs_rehash',
+  'calibrate',
+  'PasswordHasher'
+)
+
+
+SALT_SIZE = 16
+DIGEST_SIZE = 32
+SCRYPT_DEFAULTS = {'ln': 14, 'r': 8, 'p': 1}
+PBKDF2_DEFAULTS = {'hash_name': 'sha256', 'iterations': 600000}
+
+
+def _b64(data):
+    return b64encode(data).decode('ascii').rstrip('=')
+
+
+def _unb64(data):
+    return b64decode(data + '=' * (-len(data) % 4))
+
+
+def _scrypt(password, salt, ln, r, p, dklen=DIGEST_SIZE):
+    n = 1 << ln
+    return hashlib.scrypt(
+        password, salt=salt, n=n, r=r, p=p, dklen=dklen,
+        maxmem=256 * r * n * p + (1 << 20))
+
+
+def _parse(hashed):
+    try:
+        _, method, params, salt, digest = hashed.split('$')
+        params = dict(param.split('=', 1) for param in params.split(','))
+        params = {name: int(value) for name, value in params.items()}
+        salt, digest = _unb64(salt), _unb64(digest)
+    except (ValueError, binascii.Error):
+        raise ValueError("Malformed password hash")
+    if method == 'scrypt':
+        if set(params) != {'ln', 'r', 'p'}:
+            raise ValueError("Malformed password hash")
+    elif method.startswith('pbkdf2-'):
+        if set(params) != {'i'}:
+            raise ValueError("Malformed password hash")
+    else:
+        raise ValueError("Unsupported password hash %r" % method)
+    return method, params, salt, digest
+
+
+def _derive(method, params, password, salt, dklen):
+    password = uniorbytes(password, bytes)
+    if method == 'scrypt':
+        return _scrypt(
+            password, salt, params['ln'], params['r'], params['p'], dklen)
+    return hashlib.pbkdf2_hmac(
+        method[7:], password, salt, params['i'], dklen)
+
+
+def hash_password(password, method='scrypt', **params):
+    """ Hashes @password with a random salt
+
+        @password: #str or #bytes password
+        @method: #str |scrypt| or |pbkdf2|
+        @params: cost parameters, |ln|, |r| and |p| for scrypt and
+            |hash_name| and |iterations| for pbkdf2, e.g. from
+            :func:calibrate
+
+        -> #str password hash
+        ..
+            from vital.security.passwords import hash_password, \\
+                verify_password
+
+            hashed = hash_password('correct horse battery staple')
+            # -> '$scrypt$ln=14,r=8,p=1$...$...'
+            verify_password('correct horse battery staple', hashed)
+            # -> True
+        ..
+    """
+    salt = os.urandom(SALT_SIZE)
+    if method == 'scrypt':
+        params = dict(SCRYPT_DEFAULTS, **params)
+        method_params = 'ln=%(ln)d,r=%(r)d,p=%(p)d' % params
+        params = {'ln': params['ln'], 'r': params['r'], 'p': params['p']}
+    elif method == 'pbkdf2':
+        params = dict(PBKDF2_DEFAULTS, **params)
+        method = 'pbkdf2-%s' % params['hash_name']
+        method_params = 'i=%d' % params['iterations']
+        params = {'i': params['iterations']}
+    else:
+        raise ValueError("Unsupported password hash method %r" % method)
+    digest = _derive(method, params, password, salt, DIGEST_SIZE)
+    return '$%s$%s$%s$%s' % (method, method_params, _b64(salt), _b64(digest))
+
+
+def verify_password(password, hashed):
+    """ -> #bool |True| if @password matches the password @hashed
+        !ValueError if @hashed is malformed
+    """
+    method, params, salt, digest = _parse(hashed)
+    return hmac.compare_digest(
+        _derive(method, params, password, salt, len(digest)), digest)
+
+
+def needs_rehash(hashed, method='scrypt', **params):
+    """ -> #bool |True| if @hashed was not made with @method and the cost
+            @params, e.g. after :func:calibrate picked new costs
+    """
+    current, current_params, _, _ = _parse(hashed)
+    if method == 'scrypt':
+        params = dict(SCRYPT_DEFAULTS, **params)
+        return current != 'scrypt' or current_params != {
+            'ln': params['ln'], 'r': params['r'], 'p': params['p']}
+    params = dict(PBKDF2_DEFAULTS, **params)
+    return current != 'pbkdf2-%s' % params['hash_name'] or \
+        current_params['i'] != params['iterations']
+
+
+def calibrate(target=0.25, method='scrypt', maxmem=64 * 1024 * 1024,
+              hash_name='sha256'):
+    """ Benchmarks this host and picks the highest costs for @method which
+        hash a password in at most about @target seconds
+
+        @target: #float seconds per hash
+        @method: #str |scrypt| or |pbkdf2|
+        @maxmem: #int maximum bytes of memory per scrypt hash
+        @hash_name: #str digest of pbkdf2
+
+        -> #dict of cost parameters for :func:hash_password
+        ..
+            params = calibrate(0.1)
+            # -> {'ln': 15, 'r': 8, 'p': 1}
+            hashed = hash_password(password, **params)
+        ..
+    """
+    password, salt = b'calibrate', os.urandom(SALT_SIZE)
+    if method == 'scrypt':
+        r, p = SCRYPT_DEFAULTS['r'], SCRYPT_DEFAULTS['p']
+        ln = 10
+        while 128 * r * (1 << (ln + 1)) * p <= maxmem:
+            start = time.perf_counter()
+            _scrypt(password, salt, ln, r, p)
+            #: Each step doubles the cost
+            if (time.perf_counter() - start) * 2 > target:
+                break
+            ln += 1
+        return {'ln': ln, 'r': r, 'p': p}
+    elif method == 'pbkdf2':
+        iterations = 10000
+        while True:
+            start = time.perf_counter()
+            hashlib.pbkdf2_hmac(hash_name, password, salt, iterations)
+            elapsed = time.perf_counter() - start
+            if elapsed > 0.05:
+                break
+            iterations *= 4
+        return {'hash_name': hash_name,
+                'iterations': max(1000, int(iterations * target / elapsed))}
+    raise ValueError("Unsupported password hash method %r" % method)
+
+
+class PasswordHasher(object):
+    """ Hashes and verifies passwords with fixed cost parameters in a
+        process pool, so a burst of logins uses every core and the calling
+        threads or event loop stay free
+        ..
+            from vital.security.passwords import PasswordHasher, calibrate
+
+            hasher = PasswordHasher(**calibrate(0.1))
+            hashed = hasher.hash('hunter2')
+
+            # In a coroutine
+            if await hasher.verify_async('hunter2', hashed):
+                if hasher.needs_rehash(hashed):
+                    pass
+        ..
+    """
+
+    def __init__(self, method='scrypt', workers=None, executor=None,
+                 **params):
+        """ @method: #str |scrypt| or |pbkdf2|
+            @workers: #int number of processes, defaults to the number of
+                CPUs
+            @executor: :class:concurrent.futures.Executor to use instead of
+                starting a process pool
+            @params: cost parameters, see :func:hash_password
+        """
+        self.method = method
+        self.params = params
+        self.workers = workers
+        self._executor = executor
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        """ -> the :class:concurrent.futures.Executor, the process pool is
+                started on first use
+        """
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(self.workers)
+        return self._executor
+
+    def hash(self, password):
+        """ -> #str hash of @password, computed in the calling thread """
+        return hash_password(password, self.method, **self.params)
+
+    def verify(self, password, hashed):
+        """ -> #bool |True| if @password matches @hashed, computed in the
+                calling thread
+        """
+        return verify_password(password, hashed)
+
+    def needs_rehash(self, hashed):
+        """ -> #bool |True| if @hashed was made with other costs """
+        return needs_rehash(hashed, self.method, **self.params)
+
+    def submit_hash(self, password):
+        """ -> :class:concurrent.futures.Future of the hash of @password """
+        return self.executor.submit(
+            hash_password, password, self.method, **self.params)
+
+    def submit_verify(self, password, hashed):
+        """ -> :class:concurrent.futures.Future of :meth:verify """
+        return self.executor.submit(verify_password, password, hashed)
+
+    def verify_many(self, pairs):
+        """ -> #list of #bool for each (password, hashed) of @pairs,
+                verified in parallel in the pool
+        """
+        futures = [self.submit_verify(*pair) for pair in pairs]
+        return [future.result() for future in futures]
+
+    async def hash_async(self, password):
+        """ -> #str hash of @password, computed in the pool """
+        return await asyncio.wrap_future(self.submit_hash(password))
+
+    async def verify_async(self, password, hashed):
+        """ -> #bool :meth:verify computed in the pool """
+        return await asyncio.wrap_future(
+            self.submit_verify(password, hashed))
+
+    def shutdown(self, wait=True):
+        """ Shuts down the pool """
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+
+   `Vital Security sessions`
+    Server-side sessions whose cookie carries only a signed session ID,
+    with the session data in a bounded local cache written behind to disk
+--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--
+    The MIT License (MIT) (c) 2016 Jared Lunde
+
+"""
+import time
+import string
+from copy import deepcopy
+from operator import itemgetter
+
+from vital.cache.write_behind import WriteBehindStore, SqliteBackend
+from vital.security import CookieSigner, randkey
+
+
+__all__ = ('Session', 'SessionStore')
+
+
+class Session(dict):
+    """ The data of one session. Assigning, deleting or updating keys
+        marks the session as :attr:modified, changes nested inside of
+        values are not seen and need :meth:mark_modified.
+    """
+    __slots__ = ('sid', 'new', 'modified', 'expires')
+
+    def __init__(self, sid, data=None, expires=None, new=False):
+        dict.__init__(self, data or ())
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.expires = expires
+
+    def mark_modified(self):
+        """ Marks the session to be written by
+            :meth:SessionStore.save
+        """
+        self.modified = True
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self.modified = True
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self.modified = True
+
+    def clear(self):
+        dict.clear(self)
+        self.modified = True
+
+    def pop(self, key, *default):
+        self.modified = True
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        self.modified = True
+        return dict.popitem(self)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self.modified = True
+        return dict.setdefault(self, key, default)
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self.modified = True
+
+
+class SessionStore(object):
+    """ Sessions identified by random IDs from :func:vital.security.randkey
+        which are sent to the client as a signed cookie, while the session
+        data stays on the server.
+
+        Session data is held in the bounded in-memory LRU of a
+        :class:vital.cache.write_behind.WriteBehindStore and written behind
+        to its backend, by default a sqlite database at @path. Sessions
+        missing from memory are loaded lazily from the backend. Only
+        sessions which are new or :attr:Session.modified are written,
+        except that the expiration time of an unchanged session is renewed
+        once less than half of @ttl remains. Expired sessions are deleted
+        from the backend every @purge_interval seconds and on :meth:flush,
+        so abandoned sessions don't accumulate.
+        ..
+            from vital.security.sessions import SessionStore
+
+            sessions = SessionStore(secret, '/var/lib/app/sessions.db')
+
+            def handle(request, response):
+                session = sessions.load(request.cookies.get('sid')) or \\
+                    sessions.new()
+                session['views'] = session.get('views', 0) + 1
+                response.set_cookie('sid', sessions.save(session))
+        ..
+    """
+
+    def __init__(self, secret, path=None, backend=None, ttl=14 * 86400,
+                 cache_size=10000, bits=256,
+                 keyspace=string.ascii_letters + string.digits,
+                 key_salt='vital.security.sessions', interval=1.0,
+                 purge_interval=300):
+        """ @secret: #str or #bytes secret the session ID cookies are
+                signed with
+            @path: #str path of the sqlite database to store sessions in
+            @backend: backend of the
+                :class:vital.cache.write_behind.WriteBehindStore to use
+                instead of a sqlite database at @path. Its |purge| method,
+                if any, must delete the sessions which have expired, the
+                records stored are (#float expiry unix time, #dict data).
+            @ttl: #int seconds a session lives without being saved
+            @cache_size: #int maximum number of sessions, and of verified
+                session ID cookies, kept in memory
+            @bits: #int bits of entropy in each session ID
+            @keyspace: #str characters session IDs are made of
+            @key_salt: HMAC key signing salt of the cookies
+            @interval: #float seconds between writes to the backend
+            @purge_interval: #float seconds between deletions of expired
+                sessions from the backend
+        """
+        if backend is None:
+            if path is None:
+                raise ValueError("Either a path or a backend is required")
+            backend = SqliteBackend(
+                path, table='vital_sessions', expires=itemgetter(0))
+        self.ttl = ttl
+        self.bits = bits
+        self.keyspace = keyspace
+        self.signer = CookieSigner(
+            secret, key_salt, cache_size=cache_size, cache_ttl=ttl)
+        self.store = WriteBehindStore(
+            backend, interval=interval, maxsize=cache_size,
+            purge_interval=purge_interval)
+
+    def new(self):
+        """ -> a new, empty :class:Session """
+        return Session(
+            randkey(self.bits, self.keyspace), expires=time.time() + self.ttl,
+            new=True)
+
+    def get(self, sid):
+        """ -> the :class:Session with the ID @sid or |None| if it does not
+                exist or has expired
+        """
+        record = self.store.get(sid)
+        if record is None:
+            return None
+        expires, data = record
+        if expires <= time.time():
+            self.store.delete(sid)
+            return None
+        #: The cached data is copied so that changes, including nested
+        #  ones, are only seen by other requests once the session is saved
+        return Session(sid, deepcopy(data), expires)
+
+    def load(self, cookie):
+        """ -> the :class:Session of the signed session ID @cookie or |None|
+                if the cookie is empty, fails verification or the session
+                does not exist or has expired
+        """
+        sid = self.signer.verify(cookie) if cookie else None
+        if not isinstance(sid, str):
+            return None
+        return self.get(sid)
+
+    def save(self, session):
+        """ Schedules @session to be written if it is new, modified or
+            about to expire, the write itself happens in the background
+
+            -> #str signed session ID cookie of @session
+        """
+        now = time.time()
+        if session.new or session.modified or \
+                session.expires - now < self.ttl / 2:
+            session.expires = now + self.ttl
+            self.store[session.sid] = (
+                session.expires, deepcopy(dict(session)))
+            session.new = session.modified = False
+        return self.cookie(session)
+
+    def cookie(self, session):
+        """ -> #str signed session ID cookie of @session """
+        return self.signer.sign(session.sid)
+
+    def delete(self, session):
+        """ Deletes the :class:Session or session ID @session """
+        self.store.delete(getattr(session, 'sid', session))
+
+    def flush(self):
+        """ Writes all pending session changes to the backend and deletes
+            the expired sessions from it
+        """
+        self.store.flush()
+        self.store.purge()
+
+    def close(self):
+        """ Flushes pending changes and closes the backend """
+        self.store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
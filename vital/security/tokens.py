@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+
+   `Vital Security token store`
+    Issues and validates opaque bearer tokens while storing only a keyed
+    hash of each of them
+--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--·--
+    The MIT License (MIT) (c) 2016 Jared Lunde
+
+"""
+import os
+import hmac
+import atexit
+import string
+import threading
+from math import ceil
+from hashlib import sha256
+
+from vital.cache import high_pickle
+from vital.security import randkey, chars_in
+from vital.tools.encoding import uniorbytes
+
+
+__all__ = ('TokenStore',)
+
+
+class TokenStore(object):
+    """ Issues random bearer tokens and validates them in constant time
+        regardless of how many tokens exist. The store never holds the
+        tokens themselves, only an HMAC-SHA256 of each one under @secret.
+        The first 8 bytes of the HMAC index a dict and the rest of it is
+        compared with :func:hmac.compare_digest, so validating a token is
+        one HMAC, one dict lookup and one constant-time comparison.
+
+        With a @path, changes are written behind: a daemon thread saves
+        the token hashes at most every @autosave seconds once tokens have
+        been issued or revoked, and on :meth:close or interpreter exit.
+        Issuing a token never waits on the disk, and a burst of issues
+        costs one write of the file.
+        ..
+            from vital.security.tokens import TokenStore
+
+            store = TokenStore(secret, path='/var/lib/app/tokens.pickle')
+            token = store.issue({'user_id': 1234, 'scope': 'read'})
+            # -> 'Qm5H3v...'
+            store.verify(token)
+            # -> {'user_id': 1234, 'scope': 'read'}
+            store.revoke(token)
+            store.verify(token)
+            # -> None
+        ..
+    """
+    INDEX_SIZE = 8
+
+    def __init__(self, secret, path=None, bits=256,
+                 keyspace=string.ascii_letters + string.digits,
+                 autosave=1.0):
+        """ @secret: #str or #bytes secret the token hashes are keyed
+                with, keep it out of the persisted file
+            @path: #str path of a local file to persist the token hashes to
+            @bits: #int bits of entropy in each token, see
+                :func:vital.security.chars_in
+            @keyspace: #str characters tokens are made of
+            @autosave: #float seconds between saves of changes to @path,
+                |None| to only save on :meth:save and :meth:close. Changes
+                made since the last save are lost if the process dies.
+        """
+        self.path = path
+        self.bits = bits
+        self.keyspace = keyspace
+        self.autosave = autosave
+        self._mac = hmac.new(uniorbytes(secret, bytes), digestmod=sha256)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._index = {}
+        self._dirty = False
+        self._closed = threading.Event()
+        self._thread = None
+        if path is not None:
+            try:
+                with open(path, 'rb') as f:
+                    self._index = high_pickle.load(f)
+            except FileNotFoundError:
+                pass
+            if autosave:
+                self._thread = threading.Thread(
+                    target=self._run, name='TokenStore', daemon=True)
+                self._thread.start()
+            atexit.register(self.close)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, token):
+        return self._lookup(token) is not None
+
+    @property
+    def token_size(self):
+        """ -> #int number of characters in each issued token """
+        return int(ceil(chars_in(self.bits, self.keyspace)))
+
+    def _digest(self, token):
+        mac = self._mac.copy()
+        mac.update(uniorbytes(token, bytes))
+        return mac.digest()
+
+    def _lookup(self, token):
+        if not token:
+            return None
+        digest = self._digest(token)
+        entry = self._index.get(digest[:self.INDEX_SIZE])
+        if entry is None or not hmac.compare_digest(
+                entry[0], digest[self.INDEX_SIZE:]):
+            return None
+        return entry
+
+    def issue(self, data=None):
+        """ Issues a new token
+
+            @data: value returned by :meth:verify for the token, picklable
+                if the store is persisted
+
+            -> #str token
+        """
+        with self._lock:
+            while True:
+                token = randkey(self.bits, self.keyspace)
+                digest = self._digest(token)
+                selector = digest[:self.INDEX_SIZE]
+                if selector not in self._index:
+                    break
+            self._index[selector] = (digest[self.INDEX_SIZE:], data)
+            self._dirty = True
+        return token
+
+    def verify(self, token):
+        """ -> the @data the @token was issued with, or |None| if @token
+                was not issued by this store or was revoked. Tokens issued
+                without @data verify to |True|.
+        """
+        entry = self._lookup(token)
+        if entry is None:
+            return None
+        return True if entry[1] is None else entry[1]
+
+    def revoke(self, token):
+        """ Revokes @token
+
+            -> #bool |True| if @token was valid
+        """
+        with self._lock:
+            if self._lookup(token) is None:
+                return False
+            del self._index[self._digest(token)[:self.INDEX_SIZE]]
+            self._dirty = True
+        return True
+
+    def save(self):
+        """ Atomically writes the token hashes to :attr:path. Only a copy
+            of the index is taken under the lock, so tokens can be issued
+            and verified while the file is written.
+        """
+        if self.path is None:
+            return
+        with self._save_lock:
+            with self._lock:
+                index = dict(self._index)
+                self._dirty = False
+            try:
+                tmp = '%s.%d.tmp' % (self.path, os.getpid())
+                with open(tmp, 'wb') as f:
+                    high_pickle.dump(index, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+            except Exception:
+                self._dirty = True
+                raise
+
+    def _run(self):
+        while not self._closed.wait(self.autosave):
+            if self._dirty:
+                try:
+                    self.save()
+                except Exception:
+                    #: Still dirty, try again on the next interval
+                    pass
+
+    def close(self):
+        """ Stops the autosave thread and saves any unsaved changes """
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        if self._thread is not None and \
+                self._thread is not threading.current_thread():
+            self._thread.join()
+        if self._dirty:
+            self.save()
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()